@@ -0,0 +1,240 @@
+"""
+Prueba de carga de la API con datos sembrados.
+
+Lanza usuarios virtuales (inquilinos y administradores) contra la app y mide
+p50/p95/p99 y peticiones por segundo de cada ruta. Los JWT se generan con
+create_jwt_token (mismo SECRET_KEY que la app) usando los propietarios reales
+de los contratos de la base de benchmark:
+
+    python -m benchmarks.pipelines seed --apartments 500
+    python -m benchmarks.load --start-app --tenants 40 --admins 5 --duration 30
+
+Con --start-app se levanta uvicorn apuntando a BENCH_MONGODB_URI y la base de
+benchmark (nunca a la de producción); si no, se usa --base-url. El escenario de login solo se incluye si existen
+LOAD_LOGIN_EMAIL y LOAD_LOGIN_PASSWORD (llama a Firebase).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import httpx
+
+from benchmarks.pipelines import BENCH_DB, BENCH_URI, get_bench_db, check_bench_target
+from utils.security import create_jwt_token
+
+
+@dataclass
+class Operation:
+    """Una petición de un escenario: route es la plantilla con la que se agrupa el reporte"""
+    name: str
+    weight: int
+    method: str
+    route: str
+    path: callable
+    body: callable = None
+
+
+@dataclass
+class VirtualUser:
+    token: str
+    contracts: list = field(default_factory=list)
+
+
+def _pay_body(contract_id) -> dict:
+    return {"id_Contract": str(contract_id), "cost": random.choice((450, 500, 650)),
+            "id_Pyment_Method": "transferencia", "is_paid": True}
+
+
+TENANT_SCENARIO = [
+    Operation("list_pays", 5, "GET", "/contratos/{contract_id}/pagos",
+              lambda u: f"/contratos/{random.choice(u.contracts)}/pagos?limit=50"),
+    Operation("pay_stats", 2, "GET", "/contratos/{contract_id}/pagos-estadisticas",
+              lambda u: f"/contratos/{random.choice(u.contracts)}/pagos-estadisticas"),
+    Operation("list_maintenances", 3, "GET", "/maintenances", lambda u: "/maintenances?limit=50"),
+    Operation("contract", 1, "GET", "/contracts/{contract_id}", lambda u: f"/contracts/{random.choice(u.contracts)}"),
+    Operation("apartments", 2, "GET", "/apartments", lambda u: "/apartments?limit=50"),
+]
+
+ADMIN_SCENARIO = [
+    Operation("list_pays", 3, "GET", "/contratos/{contract_id}/pagos",
+              lambda u: f"/contratos/{random.choice(u.contracts)}/pagos?limit=100&with_total=true"),
+    Operation("create_pay", 2, "POST", "/contratos/{contract_id}/pagos",
+              lambda u: f"/contratos/{random.choice(u.contracts)}/pagos",
+              lambda u: _pay_body(random.choice(u.contracts))),
+    Operation("create_pays_bulk", 1, "POST", "/pagos/lote", lambda u: "/pagos/lote",
+              lambda u: [_pay_body(c) for c in random.sample(u.contracts, min(20, len(u.contracts)))]),
+    Operation("payments_stats", 1, "GET", "/payments/stats", lambda u: "/payments/stats"),
+    Operation("pending_validation", 1, "GET", "/pagos/pendientes-validacion", lambda u: "/pagos/pendientes-validacion"),
+    Operation("list_maintenances", 2, "GET", "/maintenances", lambda u: "/maintenances?limit=100"),
+    Operation("search_contracts", 1, "GET", "/contracts/search", lambda u: f"/contracts/search?q={random.choice('abcdef')}{random.randint(10, 99)}"),
+]
+
+LOGIN_OPERATION = Operation(
+    "login", 1, "POST", "/login", lambda u: "/login",
+    lambda u: {"email": os.getenv("LOAD_LOGIN_EMAIL"), "password": os.getenv("LOAD_LOGIN_PASSWORD")}
+)
+
+
+async def build_users(tenants: int, admins: int) -> tuple[list, list]:
+    """Crea los usuarios virtuales a partir de los contratos de la base de benchmark"""
+    owners = {}
+    async for contract in get_bench_db()["contracts"].find({}, {"id_User": 1}):
+        owners.setdefault(str(contract["id_User"]), []).append(str(contract["_id"]))
+    if not owners:
+        raise SystemExit(f"La base {BENCH_DB} no tiene contratos; ejecute antes benchmarks.pipelines seed")
+
+    owner_ids = list(owners)
+    all_contracts = [c for contracts in owners.values() for c in contracts]
+    tenant_users = []
+    for i in range(tenants):
+        owner = owner_ids[i % len(owner_ids)]
+        token = create_jwt_token(f"Inquilino {i}", f"inquilino{i}@example.com", True, False, owner)
+        tenant_users.append(VirtualUser(token, owners[owner]))
+    admin_users = [
+        VirtualUser(create_jwt_token(f"Admin {i}", f"admin{i}@example.com", True, True, str(i)), all_contracts)
+        for i in range(admins)
+    ]
+    return tenant_users, admin_users
+
+
+class Recorder:
+    """Acumula latencias y estados por ruta"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, route: str, elapsed_ms: float, ok: bool):
+        self.samples.setdefault(route, []).append(elapsed_ms)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return round(ordered[index], 2)
+
+
+async def run_user(client: httpx.AsyncClient, user: VirtualUser, scenario: list, recorder: Recorder,
+                   deadline: float, think_time: float):
+    weights = [op.weight for op in scenario]
+    headers = {"Authorization": f"Bearer {user.token}"}
+    while time.monotonic() < deadline:
+        op = random.choices(scenario, weights)[0]
+        route = f"{op.method} {op.route}"
+        started = time.perf_counter()
+        try:
+            response = await client.request(op.method, op.path(user), headers=headers,
+                                            json=op.body(user) if op.body else None)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        recorder.record(route, (time.perf_counter() - started) * 1000, ok)
+        if think_time:
+            await asyncio.sleep(random.uniform(0, think_time))
+
+
+def build_report(recorder: Recorder, duration: float, config: dict) -> dict:
+    routes = []
+    for route, samples in sorted(recorder.samples.items()):
+        routes.append({
+            "route": route,
+            "requests": len(samples),
+            "errors": recorder.errors.get(route, 0),
+            "rps": round(len(samples) / duration, 2),
+            "p50_ms": percentile(samples, 50),
+            "p95_ms": percentile(samples, 95),
+            "p99_ms": percentile(samples, 99),
+        })
+    total = sum(r["requests"] for r in routes)
+    return {"created_at": datetime.utcnow().isoformat(), "config": config, "duration_s": round(duration, 2),
+            "total_requests": total, "total_rps": round(total / duration, 2), "routes": routes}
+
+
+def print_report(report: dict):
+    print(f"{report['total_requests']} peticiones en {report['duration_s']} s ({report['total_rps']} req/s)")
+    print(f"{'ruta':48} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for r in report["routes"]:
+        print(f"{r['route']:48} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+
+
+def start_app(port: int) -> subprocess.Popen:
+    """Levanta uvicorn con la app apuntando al servidor y la base de benchmark"""
+    check_bench_target()
+    env = {**os.environ, "MONGODB_URI": BENCH_URI, "DATABASE_NAME": BENCH_DB}
+    env.pop("URI", None)
+    env.pop("MONGO_DB_NAME", None)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit("La app no respondió a /health")
+
+
+async def main(args) -> dict:
+    tenant_users, admin_users = await build_users(args.tenants, args.admins)
+    tenant_scenario = list(TENANT_SCENARIO)
+    if os.getenv("LOAD_LOGIN_EMAIL") and os.getenv("LOAD_LOGIN_PASSWORD"):
+        tenant_scenario.append(LOGIN_OPERATION)
+
+    process = start_app(args.port) if args.start_app else None
+    base_url = f"http://127.0.0.1:{args.port}" if args.start_app else args.base_url
+    limits = httpx.Limits(max_connections=args.tenants + args.admins)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            await wait_ready(client)
+            recorder = Recorder()
+            started = time.monotonic()
+            deadline = started + args.duration
+            await asyncio.gather(
+                *(run_user(client, u, tenant_scenario, recorder, deadline, args.think_time) for u in tenant_users),
+                *(run_user(client, u, ADMIN_SCENARIO, recorder, deadline, args.think_time) for u in admin_users),
+            )
+            duration = time.monotonic() - started
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    config = {"base_url": base_url, "database": BENCH_DB, "tenants": args.tenants, "admins": args.admins,
+              "duration": args.duration, "think_time": args.think_time}
+    return build_report(recorder, duration, config)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--start-app", action="store_true", help="Levanta uvicorn contra la base de benchmark")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--admins", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de carga")
+    parser.add_argument("--think-time", type=float, default=0, help="Pausa máxima entre peticiones (s)")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--out", default="bench-load.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
@@ -0,0 +1,302 @@
+"""
+Benchmark y explain de los pipelines de agregación.
+
+Siembra una base aparte (BENCH_DATABASE_NAME, por defecto <DATABASE_NAME>_bench)
+en el servidor de BENCH_MONGODB_URI (por defecto un mongod local) con una cartera
+sintética, ejecuta cada pipeline de pipelines/ y registra el
+tiempo, los documentos y claves examinados y las etapas del plan ganador.
+El reporte JSON se puede comparar con uno anterior para detectar regresiones:
+
+    python -m benchmarks.pipelines seed --apartments 500 --pays-per-contract 24
+    python -m benchmarks.pipelines run --runs 5 --out bench.json --baseline main.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from utils.mongodb import DB, create_client
+from utils.indexes import sync_indexes, _plan_stages
+from utils.contract_search import build_search_keys
+from utils.pagination import Page
+from utils.pay_stats import rebuild_pipeline as pay_stats_rebuild_pipeline
+from pipelines.apartments_pipelines import get_apartments_pipeline, validate_apartment_has_contracts_pipeline
+from pipelines.contract_pipelines import (
+    get_contract_with_apartment_pipeline,
+    get_all_contracts_with_apartments_pipeline,
+    validate_contract_has_apartments_pipeline,
+    search_contracts_pipeline,
+    get_contracts_pipeline,
+)
+from pipelines.contract_details import pays_with_contract_details_pipeline
+from pipelines.pending import pays_pending_validation_pipeline
+from pipelines.ownership import (
+    contract_pays_pipeline,
+    pay_with_owner_pipeline,
+    maintenance_with_owner_pipeline,
+    user_maintenances_pipeline,
+)
+
+BENCH_DB = os.getenv("BENCH_DATABASE_NAME") or f"{DB}_bench"
+BENCH_URI = os.getenv("BENCH_MONGODB_URI") or "mongodb://localhost:27017"
+SEED_COLLECTIONS = ("apartments", "contracts", "pays", "maintenance", "maintenance_types", "pay_stats")
+INSERT_BATCH = 1000
+
+# Una regresión se marca si el tiempo crece más que este factor respecto al baseline
+TIME_REGRESSION_FACTOR = 1.5
+
+
+_bench_client = None
+
+
+def check_bench_target():
+    """Impide sembrar o cargar la base de la aplicación: seed borra colecciones"""
+    if BENCH_DB == DB:
+        raise SystemExit(f"BENCH_DATABASE_NAME ({BENCH_DB}) no puede ser la base de la aplicación")
+
+
+def get_bench_db():
+    global _bench_client
+    check_bench_target()
+    if _bench_client is None:
+        _bench_client = create_client(BENCH_URI)
+    return _bench_client[BENCH_DB]
+
+
+async def _insert(coll, docs: list):
+    for start in range(0, len(docs), INSERT_BATCH):
+        await coll.insert_many(docs[start:start + INSERT_BATCH], ordered=False)
+
+
+async def seed(apartments: int, contracts_per_apartment: int, pays_per_contract: int,
+               maintenances_per_apartment: int, seed_value: int = 42) -> dict:
+    """Borra y siembra la base de benchmark con una cartera sintética reproducible"""
+    rng = random.Random(seed_value)
+    db = get_bench_db()
+    for name in SEED_COLLECTIONS:
+        await db[name].drop()
+    await sync_indexes(db)
+
+    types = [{"_id": ObjectId(), "description": d, "base_cost": c, "active": True}
+             for d, c in (("Electrico", 80), ("Fontaneria", 60), ("Pintura", 120), ("Limpieza", 30))]
+    users = [ObjectId() for _ in range(max(1, apartments // 2))]
+    start = datetime(2024, 1, 1)
+
+    apartment_docs, contract_docs, pay_docs, maintenance_docs = [], [], [], []
+    for i in range(apartments):
+        apartment = {"_id": ObjectId(), "number": f"{chr(97 + i % 26)}{i}", "level": str(i % 20),
+                     "active": True, "number_of_contracts": 0, "active_contracts": 0, "pending_maintenances": 0}
+        apartment_docs.append(apartment)
+
+        for c in range(contracts_per_apartment):
+            active = c == contracts_per_apartment - 1
+            user = rng.choice(users)
+            contract = {"_id": ObjectId(), "id_apartment": apartment["_id"], "id_User": user, "id_user": user,
+                        "start_date": start + timedelta(days=365 * c), "end_date": start + timedelta(days=365 * (c + 1)),
+                        "active": active, "status": "active" if active else "inactive"}
+            contract["search_keys"] = build_search_keys(contract, apartment["number"])
+            contract_docs.append(contract)
+            apartment["number_of_contracts"] += 1
+            apartment["active_contracts"] += 1 if active else 0
+
+            for p in range(pays_per_contract):
+                pay_docs.append({"_id": ObjectId(), "id_Contract": contract["_id"], "cost": rng.choice((450, 500, 650)),
+                                 "date": contract["start_date"] + timedelta(days=30 * p),
+                                 "id_Pyment_Method": "transferencia", "is_paid": rng.random() > 0.1})
+
+        for _ in range(maintenances_per_apartment):
+            status = rng.choice(("pending", "done", "done"))
+            kind = rng.choice(types)
+            maintenance_docs.append({"_id": ObjectId(), "id_Apartment": apartment["_id"],
+                                     "id_Contract": contract_docs[-1]["_id"] if contract_docs else None,
+                                     "id_Maintenance_type": kind["_id"], "cost": kind["base_cost"],
+                                     "date": start + timedelta(days=rng.randrange(700)), "status": status, "active": True})
+            apartment["pending_maintenances"] += 1 if status == "pending" else 0
+
+    await _insert(db["maintenance_types"], types)
+    await _insert(db["apartments"], apartment_docs)
+    await _insert(db["contracts"], contract_docs)
+    await _insert(db["pays"], pay_docs)
+    await _insert(db["maintenance"], maintenance_docs)
+    await (await db["pays"].aggregate(pay_stats_rebuild_pipeline())).to_list()
+
+    return {"apartments": len(apartment_docs), "contracts": len(contract_docs),
+            "pays": len(pay_docs), "maintenance": len(maintenance_docs)}
+
+
+async def _samples(db) -> dict:
+    """Documentos de referencia para parametrizar los pipelines"""
+    contract = await db["contracts"].find_one({"active": True}) or {}
+    pay = await db["pays"].find_one({"id_Contract": contract.get("_id")}) or {}
+    maintenance = await db["maintenance"].find_one() or {}
+    apartment = await db["apartments"].find_one({"_id": contract.get("id_apartment")}) or {}
+    return {"contract": contract, "pay": pay, "maintenance": maintenance, "apartment": apartment}
+
+
+def build_cases(s: dict) -> list:
+    """(nombre, colección, pipeline) de cada pipeline a medir"""
+    contract_id = s["contract"].get("_id", ObjectId())
+    apartment_id = s["apartment"].get("_id", ObjectId())
+    number = s["apartment"].get("number", "a")
+    return [
+        ("apartments_list", "apartments", Page(limit=100).pipeline([], get_apartments_pipeline())),
+        ("apartment_has_contracts", "apartments", validate_apartment_has_contracts_pipeline(str(apartment_id))),
+        ("public_apartments", "apartments", Page(limit=10).pipeline([{"$match": {"active": True}}])),
+        ("contract_with_apartment", "contracts", get_contract_with_apartment_pipeline(str(contract_id))),
+        ("all_contracts_with_apartments", "contracts", get_all_contracts_with_apartments_pipeline()),
+        ("contract_has_apartments", "contracts", validate_contract_has_apartments_pipeline(str(contract_id))),
+        ("search_contracts", "contracts", search_contracts_pipeline(number[:3], Page(limit=20))),
+        ("contracts_with_apartment_info", "contracts", get_contracts_pipeline()),
+        ("contract_pays", "contracts", contract_pays_pipeline(contract_id, Page(limit=100).window(), True)),
+        ("pay_with_owner", "pays", pay_with_owner_pipeline(s["pay"].get("_id", ObjectId()), contract_id)),
+        ("pays_with_contract_details", "pays", pays_with_contract_details_pipeline(contract_id)),
+        ("pays_pending_validation", "pays", pays_pending_validation_pipeline()),
+        ("maintenance_with_owner", "maintenance", maintenance_with_owner_pipeline(s["maintenance"].get("_id", ObjectId()))),
+        ("user_maintenances", "contracts", user_maintenances_pipeline(s["contract"].get("id_User", ObjectId()))),
+    ]
+
+
+def _sum_key(node, key: str) -> int:
+    """Suma todas las apariciones de key en un documento de explain (etapas y lookups)"""
+    total = 0
+    if isinstance(node, dict):
+        for name, value in node.items():
+            if name == key and isinstance(value, (int, float)):
+                total += int(value)
+            else:
+                total += _sum_key(value, key)
+    elif isinstance(node, list):
+        total += sum(_sum_key(item, key) for item in node)
+    return total
+
+
+def _winning_stages(explain: dict) -> list:
+    plans = []
+
+    def collect(node):
+        if isinstance(node, dict):
+            for name, value in node.items():
+                if name == "winningPlan":
+                    plans.append(value)
+                else:
+                    collect(value)
+        elif isinstance(node, list):
+            for item in node:
+                collect(item)
+
+    collect(explain)
+    stages = [stage for plan in plans for stage in _plan_stages(plan)]
+    stages += [name for stage in explain.get("stages", []) for name in stage if name.startswith("$")]
+    return stages
+
+
+async def measure(db, name: str, collection: str, pipeline: list, runs: int) -> dict:
+    """Tiempo de ejecución (runs repeticiones) y métricas de explain de un pipeline"""
+    coll = db[collection]
+    timings = []
+    returned = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        returned = len(await (await coll.aggregate(pipeline)).to_list())
+        timings.append((time.perf_counter() - started) * 1000)
+
+    explain = await db.command(
+        "explain", {"aggregate": collection, "pipeline": pipeline, "cursor": {}}, verbosity="executionStats"
+    )
+    stages = _winning_stages(explain)
+    return {
+        "name": name,
+        "collection": collection,
+        "returned": returned,
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "docs_examined": _sum_key(explain, "totalDocsExamined"),
+        "keys_examined": _sum_key(explain, "totalKeysExamined"),
+        "collscan": "COLLSCAN" in stages,
+        "plan": stages,
+    }
+
+
+async def run(runs: int) -> dict:
+    db = get_bench_db()
+    counts = {name: await db[name].estimated_document_count() for name in ("apartments", "contracts", "pays", "maintenance")}
+    results = [await measure(db, *case, runs=runs) for case in build_cases(await _samples(db))]
+    return {"created_at": datetime.utcnow().isoformat(), "database": BENCH_DB, "runs": runs,
+            "dataset": counts, "results": results}
+
+
+def compare(report: dict, baseline: dict) -> list:
+    """Regresiones respecto al baseline: más documentos/claves examinados, plan distinto o más lento"""
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(result["name"])
+        if not old:
+            continue
+        reasons = []
+        for key in ("docs_examined", "keys_examined"):
+            if result[key] > old[key]:
+                reasons.append(f"{key} {old[key]} -> {result[key]}")
+        if result["plan"] != old["plan"]:
+            reasons.append("cambió el plan ganador")
+        if old["median_ms"] and result["median_ms"] > old["median_ms"] * TIME_REGRESSION_FACTOR:
+            reasons.append(f"median_ms {old['median_ms']} -> {result['median_ms']}")
+        if reasons:
+            regressions.append({"name": result["name"], "reasons": reasons})
+    return regressions
+
+
+def print_report(report: dict):
+    print(f"Base {report['database']}: {report['dataset']}")
+    print(f"{'pipeline':32} {'ms (med)':>10} {'docs':>10} {'keys':>10} {'filas':>7}  plan")
+    for r in report["results"]:
+        flag = " COLLSCAN" if r["collscan"] else ""
+        print(f"{r['name']:32} {r['median_ms']:>10} {r['docs_examined']:>10} {r['keys_examined']:>10} "
+              f"{r['returned']:>7}  {' > '.join(dict.fromkeys(r['plan']))}{flag}")
+
+
+async def _main(argv: list) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.pipelines")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_cmd = commands.add_parser("seed", help="Siembra la base de benchmark")
+    seed_cmd.add_argument("--apartments", type=int, default=200)
+    seed_cmd.add_argument("--contracts-per-apartment", type=int, default=2)
+    seed_cmd.add_argument("--pays-per-contract", type=int, default=12)
+    seed_cmd.add_argument("--maintenances-per-apartment", type=int, default=3)
+    seed_cmd.add_argument("--seed", type=int, default=42)
+
+    run_cmd = commands.add_parser("run", help="Mide los pipelines y escribe el reporte")
+    run_cmd.add_argument("--runs", type=int, default=5)
+    run_cmd.add_argument("--out", default="bench-pipelines.json")
+    run_cmd.add_argument("--baseline", help="Reporte anterior con el que comparar")
+
+    args = parser.parse_args(argv)
+    if args.command == "seed":
+        counts = await seed(args.apartments, args.contracts_per_apartment, args.pays_per_contract,
+                            args.maintenances_per_apartment, args.seed)
+        print(f"Sembrado {BENCH_DB}: {counts}")
+        return 0
+
+    report = await run(args.runs)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f))
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print_report(report)
+    for regression in report.get("regressions", []):
+        print(f"REGRESIÓN {regression['name']}: {'; '.join(regression['reasons'])}")
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
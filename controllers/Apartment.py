@@ -1,46 +1,119 @@
 from models.Apartment import Apartment
-from utils.mongodb import get_collection
+from utils.mongodb import get_collection, aggregate
+from utils.pagination import Page
+from utils.fast_json import to_api
 from fastapi import HTTPException
 from bson import ObjectId
+from pydantic import ValidationError
+from typing import AsyncIterator
 
-from pipelines.apartments_pipelines import (
-    get_apartments_pipeline,
-    validate_apartment_has_contracts_pipeline
-)
+from models.bulk import BulkItemResult, BulkResult
+from utils.bulk import insert_unordered, summarize
+from utils.imports import iter_records, iter_chunks
+from utils.etag import versions
+from utils.contract_search import apartment_renamed
+
+from utils.apartment_counters import COUNTER_FIELDS
+from pipelines.apartments_pipelines import get_apartments_pipeline
 
 coll = get_collection("apartments")
+contracts_coll = get_collection("contracts")
+
+
+def normalize_number(number: str) -> str:
+    """Forma canónica del número de apartamento (sin espacios y en minúsculas)"""
+    return number.strip().lower()
 
 
 # Crear apartamento
 async def create_Apartment(apartment: Apartment) -> Apartment:
     try:
-        apartment.number = apartment.number.strip().lower()
+        apartment.number = normalize_number(apartment.number)
 
-        existing_apartment = coll.find_one({"number": apartment.number})
+        existing_apartment = await coll.find_one({"number": apartment.number})
         if existing_apartment:
             raise HTTPException(status_code=400, detail="Apartment already exists")
 
+        # Los contadores los mantienen las escrituras de contratos y mantenimientos
+        for field in COUNTER_FIELDS:
+            setattr(apartment, field, 0)
+
         apartment_dict = apartment.model_dump(exclude={"id"})
-        inserted = coll.insert_one(apartment_dict)
+        inserted = await coll.insert_one(apartment_dict)
+        versions.bump("apartments")
         apartment.id = str(inserted.inserted_id)
 
         return apartment
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating apartment: {str(e)}")
 
+# Importar apartamentos desde CSV o NDJSON
+async def import_apartments(stream: AsyncIterator[bytes], fmt: str) -> BulkResult:
+    """Importa apartamentos por bloques: normaliza el número, descarta duplicados del
+    archivo y de la base (un $in por bloque) e inserta cada bloque con insert_many."""
+    try:
+        results = []
+        seen = set()
+        async for chunk in iter_chunks(iter_records(stream, fmt)):
+            rows = []  # (posición, documento)
+            for index, record in chunk:
+                if isinstance(record, str):
+                    results.append(BulkItemResult(index=index, status="error", error=record))
+                    continue
+                try:
+                    apartment = Apartment(**record)
+                except ValidationError as e:
+                    results.append(BulkItemResult(index=index, status="error", error=str(e.errors()[0]["msg"])))
+                    continue
+                apartment.number = normalize_number(apartment.number)
+                if apartment.number in seen:
+                    results.append(BulkItemResult(index=index, status="skipped", error="Duplicado en el archivo"))
+                    continue
+                seen.add(apartment.number)
+                doc = apartment.model_dump(exclude={"id"})
+                doc.update({field: 0 for field in COUNTER_FIELDS})
+                rows.append((index, doc))
+
+            numbers = [doc["number"] for _, doc in rows]
+            existing = set()
+            if numbers:
+                cursor = coll.find({"number": {"$in": numbers}}, {"number": 1, "_id": 0})
+                existing = {doc["number"] for doc in await cursor.to_list()}
+
+            new_rows = []
+            for index, doc in rows:
+                if doc["number"] in existing:
+                    results.append(BulkItemResult(index=index, status="skipped", error="Apartment already exists"))
+                else:
+                    new_rows.append((index, doc))
+
+            errors = await insert_unordered(coll, [doc for _, doc in new_rows])
+            versions.bump("apartments")
+            for position, (index, doc) in enumerate(new_rows):
+                if position in errors:
+                    results.append(BulkItemResult(index=index, status="error", error=errors[position]))
+                else:
+                    results.append(BulkItemResult(index=index, status="created", id=str(doc["_id"])))
+
+        return summarize(results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing apartments: {str(e)}")
+
+
 # Obtener todos los apartamentos
-async def get_Apartment() -> list[Apartment]:
+async def get_Apartment(page: Page | None = None) -> list[dict]:
     try:
-        pipeline = get_apartments_pipeline()
-        apartments = list(coll.aggregate(pipeline))
-        return [Apartment(**doc) for doc in apartments]
+        page = page or Page()
+        pipeline = page.pipeline([], get_apartments_pipeline())
+        apartments = page.unpack(await aggregate(coll, pipeline))
+        return [to_api(doc, Apartment) for doc in apartments]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching apartments: {str(e)}")
 
 # Obtener un apartamento por ID
 async def get_Apartment_id(apartment_id: str) -> Apartment:
     try:
-        doc = coll.find_one({"_id": ObjectId(apartment_id)})
+        doc = await coll.find_one({"_id": ObjectId(apartment_id)})
         if not doc:
             raise HTTPException(status_code=404, detail="Apartment not found")
 
@@ -53,21 +126,24 @@ async def get_Apartment_id(apartment_id: str) -> Apartment:
 # Actualizar un apartamento
 async def update_Apartment(apartment_id: str, apartment: Apartment) -> Apartment:
     try:
-        apartment.number = apartment.number.strip().lower()
+        apartment.number = normalize_number(apartment.number)
 
-        existing_apartment = coll.find_one({
+        existing_apartment = await coll.find_one({
             "number": apartment.number,
             "_id": {"$ne": ObjectId(apartment_id)}
         })
         if existing_apartment:
             raise HTTPException(status_code=400, detail="Apartment already exists")
 
-        result = coll.update_one(
+        old = await coll.find_one_and_update(
             {"_id": ObjectId(apartment_id)},
-            {"$set": apartment.model_dump(exclude={"id"})}
+            {"$set": apartment.model_dump(exclude={"id", *COUNTER_FIELDS})},
+            projection={"number": 1}
         )
-        if result.matched_count == 0:
+        if not old:
             raise HTTPException(status_code=404, detail="Apartment not found")
+        versions.bump("apartments")
+        await apartment_renamed(old["_id"], old.get("number"), apartment.number)
 
         return await get_Apartment_id(apartment_id)
     except Exception as e:
@@ -77,22 +153,25 @@ async def update_Apartment(apartment_id: str, apartment: Apartment) -> Apartment
 async def delete_or_deactivate_apartment(apartment_id: str) -> dict:
     """Desactiva si tiene contratos, elimina si no."""
     try:
-        pipeline = validate_apartment_has_contracts_pipeline(apartment_id)
-        result = list(coll.aggregate(pipeline))
+        oid = ObjectId(apartment_id)
+        apartment_info = await coll.find_one({"_id": oid}, {"_id": 1})
 
-        if not result:
+        if not apartment_info:
             raise HTTPException(status_code=404, detail="Apartamento no encontrado")
 
-        apartment_info = result[0]
-
-        if apartment_info["number_of_contracts"] > 0:
-            coll.update_one(
+        # Se consulta contracts directamente: el contador puede no estar al día
+        # y un falso 0 borraría un apartamento con contratos (incluye referencias
+        # aún guardadas como texto)
+        if await contracts_coll.find_one({"id_apartment": {"$in": [oid, apartment_id]}}, {"_id": 1}):
+            await coll.update_one(
                 {"_id": ObjectId(apartment_id)},
                 {"$set": {"status": "inactive"}}
             )
+            versions.bump("apartments")
             return {"message": "Apartamento tiene contratos y ha sido desactivado"}
         else:
-            coll.delete_one({"_id": ObjectId(apartment_id)})
+            await coll.delete_one({"_id": ObjectId(apartment_id)})
+            versions.bump("apartments")
             return {"message": "Apartamento eliminado exitosamente"}
 
     except Exception as e:
@@ -108,15 +187,16 @@ async def toggle_apartment_status(apartment_id: str, status: dict) -> dict:
         if new_status not in ["active", "inactive"]:
             raise HTTPException(status_code=400, detail="Estado inválido")
 
-        result = coll.update_one(
+        result = await coll.update_one(
             {"_id": ObjectId(apartment_id)},
             {"$set": {"status": new_status}}
         )
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Apartamento no encontrado")
+        versions.bump("apartments")
 
         # Obtener el apartamento completo después de actualizar
-        updated_apartment = coll.find_one({"_id": ObjectId(apartment_id)})
+        updated_apartment = await coll.find_one({"_id": ObjectId(apartment_id)})
         updated_apartment["id"] = str(updated_apartment["_id"])
         del updated_apartment["_id"]
 
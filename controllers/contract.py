@@ -1,49 +1,64 @@
-from models.contract import Contract
-from utils.mongodb import get_collection
+from models.contract import Contract, ContractPartial, ContractSearchResult
+from utils.mongodb import get_collection, aggregate
 from fastapi import HTTPException, Request
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
-from pymongo.collection import Collection
-from pipelines.contract_pipelines import validate_contract_has_apartments_pipeline  
+from utils.references import canonical_refs
+from utils.pagination import Page
+from utils.fast_json import to_api
+from utils.apartment_counters import contract_changed
+from pymongo.asynchronous.collection import AsyncCollection
+from pipelines.contract_pipelines import validate_contract_has_apartments_pipeline, search_contracts_pipeline
+from utils.contract_search import search_keys_for
 
-coll: Collection = get_collection("contracts")
+coll: AsyncCollection = get_collection("contracts")
+
+# Se guardan como datetime pero el modelo los expone como fecha
+CONTRACT_DATE_FIELDS = ("start_date", "end_date")
 
 # Lista todos los contratos
-async def get_contracts(request: Request) -> list[Contract]:
-    """Obtiene todos los contratos (público, sin validaciones de usuario)."""
+async def get_contracts(request: Request, page: Page | None = None, projection: dict | None = None) -> list[dict]:
+    """Obtiene todos los contratos (público, sin validaciones de usuario).
+    Devuelve los documentos listos para FastJSONResponse, sin construir modelos."""
     try:
-        contracts = []
-
-        for doc in coll.find({}): 
-            doc["id"] = str(doc["_id"])
-            doc.pop("_id", None)
-
-            try:
-                contracts.append(Contract(**doc))  
-            except Exception as e:
-                print(f"Contrato con datos incompletos: {doc} - Error: {e}")
+        page = page or Page()
+        stages = [{"$project": projection}] if projection else []
 
-        return contracts
+        docs = page.unpack(await aggregate(coll, page.pipeline([], stages)))
+        return [to_api(doc, Contract, date_fields=CONTRACT_DATE_FIELDS, fill_defaults=not projection) for doc in docs]
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener los contratos: {e}")
 
+# Busca contratos por prefijo
+async def search_contracts(q: str, page: Page | None = None) -> list[dict]:
+    """Busca contratos por el inicio del número de apartamento o del ID del inquilino."""
+    try:
+        page = page or Page()
+        docs = page.unpack(await aggregate(coll, search_contracts_pipeline(q, page)))
+        return [to_api(doc, ContractSearchResult, date_fields=CONTRACT_DATE_FIELDS) for doc in docs]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al buscar contratos: {e}")
+
 # Lista un contrato en específico
-async def get_contract_by_id(request: Request, contract_id: str) -> Contract:
+async def get_contract_by_id(request: Request, contract_id: str, projection: dict | None = None) -> Contract:
     """Obtiene un contrato específico (admin ve todos, usuario solo los suyos)."""
     try:
-        doc = coll.find_one({"_id": ObjectId(contract_id)})
+        # id_user se necesita siempre para validar la propiedad del contrato
+        fields = {**projection, "id_user": 1} if projection else None
+        doc = await coll.find_one({"_id": ObjectId(contract_id)}, fields)
         if not doc:
             raise HTTPException(status_code=404, detail="Contrato no encontrado")
 
         admin = getattr(request.state, "admin", False)
         user_id = str(request.state.id)
-        if not admin and doc.get("id_user") != user_id:
+        if not admin and str(doc.get("id_user")) != user_id:
             raise HTTPException(status_code=403, detail="No autorizado a ver este contrato")
 
         doc["id"] = str(doc["_id"])
         del doc["_id"]
-        return Contract(**doc)
+        return ContractPartial(**doc) if projection else Contract(**doc)
     except HTTPException:
         raise
     except Exception as e:
@@ -52,39 +67,53 @@ async def get_contract_by_id(request: Request, contract_id: str) -> Contract:
 # Crea un nuevo contrato 
 async def create_contract(contract: Contract) -> Contract:
     try:
-        contract_dict = contract.model_dump(exclude={"id"})
+        contract_dict = canonical_refs(contract.model_dump(exclude={"id"}), "contracts")
 
         if contract_dict.get("start_date"):
             contract_dict["start_date"] = datetime.combine(contract_dict["start_date"], datetime.min.time())
         if contract_dict.get("end_date"):
             contract_dict["end_date"] = datetime.combine(contract_dict["end_date"], datetime.min.time())
 
-        inserted = coll.insert_one(contract_dict)
+        contract_dict["search_keys"] = await search_keys_for(contract_dict)
+        inserted = await coll.insert_one(contract_dict)
+        await contract_changed(None, contract_dict)
         contract.id = str(inserted.inserted_id)
         return contract
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al crear el contrato: {e}")
 
 # Actualiza un contrato
 async def update_contract(contract_id: str, contract: Contract) -> Contract:
     try:
-        contract_dict = contract.model_dump(exclude={"id"})
+        contract_dict = canonical_refs(contract.model_dump(exclude={"id"}), "contracts")
 
         if contract_dict.get("start_date"):
             contract_dict["start_date"] = datetime.combine(contract_dict["start_date"], datetime.min.time())
         if contract_dict.get("end_date"):
             contract_dict["end_date"] = datetime.combine(contract_dict["end_date"], datetime.min.time())
 
-        result = coll.update_one({"_id": ObjectId(contract_id)}, {"$set": contract_dict})
-        if result.matched_count == 0:
+        old_doc = await coll.find_one_and_update(
+            {"_id": ObjectId(contract_id)},
+            {"$set": contract_dict},
+            return_document=ReturnDocument.BEFORE
+        )
+        if not old_doc:
             raise HTTPException(status_code=404, detail="Contrato no encontrado")
 
-        updated_doc = coll.find_one({"_id": ObjectId(contract_id)})
+        updated_doc = {**old_doc, **contract_dict}
+        await contract_changed(old_doc, updated_doc)
+        search_keys = await search_keys_for(updated_doc)
+        if search_keys != old_doc.get("search_keys"):
+            await coll.update_one({"_id": old_doc["_id"]}, {"$set": {"search_keys": search_keys}})
         updated_doc["id"] = str(updated_doc["_id"])
         updated_doc.pop("_id", None)
 
         return Contract(**updated_doc)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al actualizar contrato: {e}")
 
@@ -93,23 +122,25 @@ async def update_contract(contract_id: str, contract: Contract) -> Contract:
 async def delete_or_deactivate_contract(contract_id: str) -> dict:
     """Elimina cualquier contrato sin validaciones."""
     try:
-        contract = coll.find_one({"_id": ObjectId(contract_id)})
+        contract = await coll.find_one({"_id": ObjectId(contract_id)})
         if not contract:
             raise HTTPException(status_code=404, detail="Contrato no encontrado")
 
         # Revisar si tiene apartamentos asignados
         pipeline = validate_contract_has_apartments_pipeline(contract_id)
-        assigned = list(coll.aggregate(pipeline))
+        assigned = await aggregate(coll, pipeline)
         num_apts = assigned[0]["number_of_apartments"] if assigned else 0
 
         if num_apts > 0:
-            coll.update_one(
+            await coll.update_one(
                 {"_id": ObjectId(contract_id)},
                 {"$set": {"status": "inactive"}}
             )
+            await contract_changed(contract, {**contract, "status": "inactive"})
             return {"message": "Contrato tiene apartamentos y ha sido desactivado"}
         else:
-            coll.delete_one({"_id": ObjectId(contract_id)})
+            await coll.delete_one({"_id": ObjectId(contract_id)})
+            await contract_changed(contract, None)
             return {"message": "Contrato eliminado exitosamente"}
 
     except Exception as e:
@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime, date, time, timedelta
+
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from utils.mongodb import get_collection
+from utils.references import parse_object_id
+
+# Documentos por lote leído del cursor y por bloque escrito en la respuesta
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# colección expuesta -> (colección en MongoDB, campo de fecha, campo de contrato, columnas)
+EXPORTS = {
+    "pays": (
+        "pays", "date", "id_Contract",
+        ["id", "id_Contract", "cost", "date", "id_Pyment_Method", "is_paid"]
+    ),
+    "contracts": (
+        "contracts", "start_date", "_id",
+        ["id", "id_apartment", "start_date", "end_date", "active"]
+    ),
+    "maintenances": (
+        "maintenance", "date", "id_Contract",
+        ["id", "id_Apartment", "id_Contract", "id_Maintenance_type", "cost", "date"]
+    ),
+}
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _plain(value):
+    """Convierte valores BSON a tipos serializables"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _row(doc: dict, columns: list[str]) -> dict:
+    doc["id"] = doc.pop("_id")
+    return {column: _plain(doc.get(column)) for column in columns}
+
+
+def build_export_query(
+    date_field: str,
+    contract_field: str,
+    from_date: date | None = None,
+    to_date: date | None = None,
+    contract_id: str | None = None,
+    is_paid: bool | None = None
+) -> dict:
+    """Construye el filtro de la exportación; ambas fechas son inclusivas (día completo)"""
+    query = {}
+    if from_date or to_date:
+        query[date_field] = {}
+        if from_date:
+            query[date_field]["$gte"] = datetime.combine(from_date, time.min)
+        if to_date:
+            # Las fechas se guardan con hora: se incluye todo el último día
+            query[date_field]["$lt"] = datetime.combine(to_date + timedelta(days=1), time.min)
+    if contract_id:
+        oid_contract = parse_object_id(contract_id)
+        if not oid_contract:
+            raise HTTPException(status_code=400, detail="ID de contrato inválido")
+        query[contract_field] = oid_contract
+    if is_paid is not None:
+        query["is_paid"] = is_paid
+    return query
+
+
+async def _ndjson_chunks(cursor, columns: list[str]):
+    lines = []
+    async for doc in cursor:
+        lines.append(json.dumps(_row(doc, columns), ensure_ascii=False))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def _csv_chunks(cursor, columns: list[str]):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    rows = 0
+    async for doc in cursor:
+        writer.writerow(_row(doc, columns))
+        rows += 1
+        if rows >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            rows = 0
+    yield buffer.getvalue()
+
+
+async def export_collection(
+    name: str,
+    format: str = "ndjson",
+    from_date: date | None = None,
+    to_date: date | None = None,
+    contract_id: str | None = None,
+    is_paid: bool | None = None
+) -> StreamingResponse:
+    """Exporta una colección en NDJSON o CSV leyendo el cursor por lotes (memoria constante)."""
+    if name not in EXPORTS:
+        raise HTTPException(status_code=404, detail="Exportación no disponible")
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Formato inválido, use ndjson o csv")
+    if is_paid is not None and name != "pays":
+        raise HTTPException(status_code=400, detail="is_paid solo aplica a pagos")
+
+    collection, date_field, contract_field, columns = EXPORTS[name]
+    query = build_export_query(date_field, contract_field, from_date, to_date, contract_id, is_paid)
+    projection = {column: 1 for column in columns if column != "id"}
+
+    cursor = get_collection(collection).find(query, projection).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+    chunks = _csv_chunks(cursor, columns) if format == "csv" else _ndjson_chunks(cursor, columns)
+
+    filename = f"{name}-{datetime.utcnow():%Y%m%d%H%M%S}.{format}"
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -1,7 +1,15 @@
 from fastapi import HTTPException, Request
 from bson import ObjectId
-from utils.mongodb import get_collection
-from models.maintenance import Maintenance
+from pymongo import ReturnDocument
+from utils.mongodb import get_collection, aggregate
+from models.maintenance import Maintenance, MaintenancePartial
+from utils.references import canonical_refs
+from utils.bulk import MAX_BULK_ITEMS, insert_unordered, summarize
+from models.bulk import BulkItemResult, BulkResult
+from utils.pagination import Page
+from utils.fast_json import to_api
+from utils.apartment_counters import maintenance_changed, maintenances_created
+from pipelines.ownership import maintenance_with_owner_pipeline, user_maintenances_pipeline
 
 maintenance_coll = get_collection("maintenance")
 type_coll = get_collection("maintenance_types")
@@ -9,56 +17,29 @@ contracts_coll = get_collection("contracts")
 
 
 # Función auxiliar para verificar si el mantenimiento pertenece al usuario
-def maintenance_belongs_to_user(maintenance_doc, user_id: str) -> bool:
-    contract_id = maintenance_doc.get("id_Contract")
-    if not contract_id:
-        return False
-    contract = contracts_coll.find_one({"_id": ObjectId(contract_id)})
-    return contract and str(contract.get("id_User")) == str(user_id)
+def maintenance_belongs_to_user(owner, user_id: str) -> bool:
+    return owner is not None and str(owner) == str(user_id)
 
 
 # Lista todos los mantenimientos
-async def get_all_maintenances(request: Request) -> list[Maintenance]:
-    """Obtiene todos los mantenimientos (admin ve todos, usuario solo los suyos)."""
+async def get_all_maintenances(request: Request, page: Page | None = None, projection: dict | None = None) -> list[dict]:
+    """Obtiene todos los mantenimientos (admin ve todos, usuario solo los suyos).
+    Devuelve los documentos listos para FastJSONResponse, sin construir modelos."""
     try:
         user_id = request.state.id
         admin = getattr(request.state, "admin", False)
-        maintenances = []
-
-        print("DEBUG → user_id:", user_id, "| admin:", admin)
+        page = page or Page()
+        stages = [{"$project": projection}] if projection else []
 
         if admin:
-            cursor = maintenance_coll.find({})
+            rows = await aggregate(maintenance_coll, page.pipeline([], stages))
         else:
-            # Buscar contratos donde el usuario sea propietario (acepta str y ObjectId)
-            user_contracts = contracts_coll.find({
-                "$or": [
-                    {"id_User": ObjectId(user_id)},
-                    {"id_User": user_id}
-                ]
-            })
-
-            contract_ids = [str(c["_id"]) for c in user_contracts]
-
-            print("DEBUG → contratos encontrados:", contract_ids)
-
-            if not contract_ids:
-                return []
-
-            # Buscar mantenimientos relacionados con esos contratos
-            cursor = maintenance_coll.find({
-                "$or": [
-                    {"id_Contract": {"$in": contract_ids}},
-                    {"id_Contract": {"$in": [ObjectId(cid) for cid in contract_ids]}}
-                ]
-            })
-
-        for doc in cursor:
-            doc["id"] = str(doc["_id"])
-            del doc["_id"]
-            maintenances.append(Maintenance(**doc))
-
-        print(f"DEBUG → encontrados {len(maintenances)} mantenimientos")
+            # Contratos del usuario y sus mantenimientos en una sola agregación
+            pipeline = page.pipeline(user_maintenances_pipeline(ObjectId(user_id)), stages)
+            rows = await aggregate(contracts_coll, pipeline)
+
+        maintenances = [to_api(doc, Maintenance, fill_defaults=not projection) for doc in page.unpack(rows)]
+
         return maintenances
 
     except Exception as e:
@@ -67,22 +48,27 @@ async def get_all_maintenances(request: Request) -> list[Maintenance]:
 
 
 # Lista un mantenimiento en especifico
-async def get_maintenance_by_id(request: Request, maintenance_id: str) -> Maintenance:
+async def get_maintenance_by_id(request: Request, maintenance_id: str, projection: dict | None = None) -> Maintenance:
     """Obtiene un mantenimiento en especifico (admin ve todos, usuario solo los suyos)."""
     try:
         user_id = request.state.id
         admin = getattr(request.state, "admin", False)
 
-        doc = maintenance_coll.find_one({"_id": ObjectId(maintenance_id)})
-        if not doc:
+        pipeline = maintenance_with_owner_pipeline(ObjectId(maintenance_id))
+        if projection:
+            pipeline.append({"$project": {**projection, "owner": 1}})
+        rows = await aggregate(maintenance_coll, pipeline)
+        if not rows:
             raise HTTPException(status_code=404, detail="Mantenimiento no encontrado")
 
-        if not admin and not maintenance_belongs_to_user(doc, user_id):
+        doc = rows[0]
+        owner = doc.pop("owner", None)
+        if not admin and not maintenance_belongs_to_user(owner, user_id):
             raise HTTPException(status_code=403, detail="No autorizado para ver este mantenimiento")
 
         doc["id"] = str(doc["_id"])
         del doc["_id"]
-        return Maintenance(**doc)
+        return MaintenancePartial(**doc) if projection else Maintenance(**doc)
 
     except HTTPException:
         # Propaga las excepciones HTTP tal cual
@@ -100,24 +86,80 @@ async def create_maintenance(request: Request, m: Maintenance) -> Maintenance:
             raise HTTPException(status_code=403, detail="Solo administradores pueden crear mantenimientos")
 
         # Validar tipo de mantenimiento
-        maintenance_type_doc = type_coll.find_one({"_id": ObjectId(m.id_Maintenance_type), "active": True})
+        maintenance_type_doc = await type_coll.find_one({"_id": ObjectId(m.id_Maintenance_type), "active": True})
         if not maintenance_type_doc:
             raise HTTPException(status_code=400, detail="Tipo de mantenimiento inválido o inactivo")
 
         # Validar contrato
-        contract_doc = contracts_coll.find_one({"_id": ObjectId(m.id_Contract)})
+        contract_doc = await contracts_coll.find_one({"_id": ObjectId(m.id_Contract)})
         if not contract_doc:
             raise HTTPException(status_code=400, detail="Contrato no existe")
 
-        m_dict = m.model_dump(exclude={"id"})
-        inserted = maintenance_coll.insert_one(m_dict)
+        m_dict = canonical_refs(m.model_dump(exclude={"id"}), "maintenance")
+        inserted = await maintenance_coll.insert_one(m_dict)
+        await maintenance_changed(None, m_dict)
         m.id = str(inserted.inserted_id)
         return m
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creando mantenimiento: {str(e)}")
 
 
 
+# Crear mantenimientos por lotes
+async def create_maintenances(request: Request, items: list[Maintenance]) -> BulkResult:
+    """Crea mantenimientos por lotes (solo administradores): resuelve tipos y contratos
+    con una consulta cada uno y escribe las filas válidas en un solo insert_many."""
+    try:
+        if not getattr(request.state, "admin", False):
+            raise HTTPException(status_code=403, detail="Solo administradores pueden crear mantenimientos")
+        if len(items) > MAX_BULK_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Máximo {MAX_BULK_ITEMS} mantenimientos por petición")
+
+        results = []
+        pending = []  # (posición, documento)
+        for index, m in enumerate(items):
+            try:
+                pending.append((index, canonical_refs(m.model_dump(exclude={"id"}), "maintenance")))
+            except HTTPException as e:
+                results.append(BulkItemResult(index=index, status="error", error=e.detail))
+
+        type_ids = list({doc["id_Maintenance_type"] for _, doc in pending})
+        contract_ids = list({doc["id_Contract"] for _, doc in pending})
+        active_types, contracts = set(), set()
+        if pending:
+            types_cursor = type_coll.find({"_id": {"$in": type_ids}, "active": True}, {"_id": 1})
+            contracts_cursor = contracts_coll.find({"_id": {"$in": contract_ids}}, {"_id": 1})
+            active_types = {doc["_id"] for doc in await types_cursor.to_list()}
+            contracts = {doc["_id"] for doc in await contracts_cursor.to_list()}
+
+        valid = []
+        for index, doc in pending:
+            if doc["id_Maintenance_type"] not in active_types:
+                results.append(BulkItemResult(index=index, status="error", error="Tipo de mantenimiento inválido o inactivo"))
+            elif doc["id_Contract"] not in contracts:
+                results.append(BulkItemResult(index=index, status="error", error="Contrato no existe"))
+            else:
+                valid.append((index, doc))
+
+        errors = await insert_unordered(maintenance_coll, [doc for _, doc in valid])
+        inserted = []
+        for position, (index, doc) in enumerate(valid):
+            if position in errors:
+                results.append(BulkItemResult(index=index, status="error", error=errors[position]))
+            else:
+                inserted.append(doc)
+                results.append(BulkItemResult(index=index, status="created", id=str(doc["_id"])))
+
+        await maintenances_created(inserted)
+        return summarize(results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creando mantenimientos: {str(e)}")
+
+
 #  actualizar mantenimiento 
 async def update_maintenance(request: Request, maintenance_id: str, m: Maintenance) -> Maintenance:
     """Actualiza un mantenimiento (solo administradores)."""
@@ -126,18 +168,26 @@ async def update_maintenance(request: Request, maintenance_id: str, m: Maintenan
             raise HTTPException(status_code=403, detail="Solo administradores pueden actualizar mantenimientos")
 
         # Validar tipo de mantenimiento
-        maintenance_type_doc = type_coll.find_one({"_id": ObjectId(m.id_Maintenance_type), "active": True})
+        maintenance_type_doc = await type_coll.find_one({"_id": ObjectId(m.id_Maintenance_type), "active": True})
         if not maintenance_type_doc:
             raise HTTPException(status_code=400, detail="Tipo de mantenimiento inválido o inactivo")
 
-        result = maintenance_coll.update_one(
+        # status solo se modifica si el cliente lo envió; omitirlo no debe
+        # devolver a "pending" un mantenimiento ya resuelto
+        exclude = {"id"} if "status" in m.model_fields_set else {"id", "status"}
+        m_dict = canonical_refs(m.model_dump(exclude=exclude), "maintenance")
+        old = await maintenance_coll.find_one_and_update(
             {"_id": ObjectId(maintenance_id)},
-            {"$set": m.model_dump(exclude={"id"})}
+            {"$set": m_dict},
+            return_document=ReturnDocument.BEFORE
         )
-        if result.modified_count == 0:
+        if not old:
             raise HTTPException(status_code=404, detail="Mantenimiento no encontrado")
+        await maintenance_changed(old, {**old, **m_dict})
 
         return await get_maintenance_by_id(request, maintenance_id)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error actualizando mantenimiento: {str(e)}")
 
@@ -149,12 +199,14 @@ async def deactivate_maintenance(request: Request, maintenance_id: str) -> Maint
         if not getattr(request.state, "admin", False):
             raise HTTPException(status_code=403, detail="Solo administradores pueden desactivar mantenimientos")
 
-        result = maintenance_coll.update_one(
+        old = await maintenance_coll.find_one_and_update(
             {"_id": ObjectId(maintenance_id)},
-            {"$set": {"active": False}}
+            {"$set": {"active": False}},
+            return_document=ReturnDocument.BEFORE
         )
-        if result.modified_count == 0:
+        if not old:
             raise HTTPException(status_code=404, detail="Mantenimiento no encontrado")
+        await maintenance_changed(old, {**old, "active": False})
 
         return await get_maintenance_by_id(request, maintenance_id)
     except Exception as e:
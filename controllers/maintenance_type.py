@@ -1,20 +1,20 @@
 from fastapi import HTTPException
-from utils.mongodb import get_collection
+from utils.mongodb import get_collection, aggregate
+from utils.pagination import Page
+from utils.fast_json import to_api
 from models.maintenance_type import Maintenance_Type
 from bson import ObjectId
+from utils.etag import versions
 
 type_coll = get_collection("maintenance_types")
 
 # Lista todos los tipos de mantenimiento activos
-async def get_all_maintenance_types() -> list[Maintenance_Type]:
+async def get_all_maintenance_types(page: Page | None = None) -> list[dict]:
     """Obtiene todos tipos de mantenimientos (admin ve todos, usuario solo los suyos)."""
     try:
-        types = []
-        for doc in type_coll.find({"active": True}):
-            doc["id"] = str(doc["_id"])
-            del doc["_id"]
-            types.append(Maintenance_Type(**doc))
-        return types
+        page = page or Page()
+        pipeline = page.pipeline([{"$match": {"active": True}}])
+        return [to_api(doc, Maintenance_Type) for doc in page.unpack(await aggregate(type_coll, pipeline))]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo los tipos de mantenimiento: {str(e)}")
 
@@ -23,7 +23,7 @@ async def get_all_maintenance_types() -> list[Maintenance_Type]:
 async def get_maintenance_type_by_id(type_id: str) -> Maintenance_Type:
     """Obtiene un tipo de mantenimiento (admin ve todos, usuario solo los suyos)."""
     try:
-        doc = type_coll.find_one({"_id": ObjectId(type_id), "active": True})
+        doc = await type_coll.find_one({"_id": ObjectId(type_id), "active": True})
         if not doc:
             raise HTTPException(status_code=404, detail="Tipo de mantenimiento no encontrado")
         doc["id"] = str(doc["_id"])
@@ -40,10 +40,11 @@ async def create_maintenance_type(m_type: Maintenance_Type) -> Maintenance_Type:
         m_dict = m_type.model_dump(exclude={"id"})
 
         # Verificar si ya existe un tipo con la misma descripción
-        if type_coll.find_one({"description": {"$regex": f"^{m_dict['description']}$", "$options": "i"}}):
+        if await type_coll.find_one({"description": {"$regex": f"^{m_dict['description']}$", "$options": "i"}}):
             raise HTTPException(status_code=400, detail="Ya existe un tipo de mantenimiento con esta descripción")
 
-        inserted = type_coll.insert_one(m_dict)
+        inserted = await type_coll.insert_one(m_dict)
+        versions.bump("maintenance_types")
         m_type.id = str(inserted.inserted_id)
         return m_type
     except HTTPException:
@@ -57,9 +58,10 @@ async def update_maintenance_type(type_id: str, m_type: Maintenance_Type) -> Mai
     """Actualiza un tipo de mantenimiento (solo administradores)."""
     try:
         m_dict = m_type.model_dump(exclude={"id"})
-        result = type_coll.update_one({"_id": ObjectId(type_id)}, {"$set": m_dict})
+        result = await type_coll.update_one({"_id": ObjectId(type_id)}, {"$set": m_dict})
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Tipo de mantenimiento no encontrado")
+        versions.bump("maintenance_types")
         return await get_maintenance_type_by_id(type_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error actualizando el tipo de mantenimiento: {str(e)}")
@@ -69,9 +71,10 @@ async def update_maintenance_type(type_id: str, m_type: Maintenance_Type) -> Mai
 async def deactivate_maintenance_type(type_id: str) -> Maintenance_Type:
     """Actualiza un tipo de mantenimiento (solo administradores)."""
     try:
-        result = type_coll.update_one({"_id": ObjectId(type_id)}, {"$set": {"active": False}})
+        result = await type_coll.update_one({"_id": ObjectId(type_id)}, {"$set": {"active": False}})
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Tipo de mantenimiento no encontrado")
+        versions.bump("maintenance_types")
         return await get_maintenance_type_by_id(type_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error desactivando tipo de mantenimiento: {str(e)}")
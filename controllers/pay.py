@@ -1,57 +1,47 @@
-from models.pay import Pay
-from utils.mongodb import get_collection
+from models.pay import Pay, PayPartial
+from utils.mongodb import get_collection, aggregate
 from fastapi import HTTPException, Request
 from bson import ObjectId
+from pymongo import ReturnDocument
+from utils.references import parse_object_id, canonical_refs
+from pipelines.ownership import contract_pays_pipeline, pay_with_owner_pipeline
+from utils.pagination import Page, count_of
+from utils.fast_json import to_api
+from utils.pay_stats import record_pay, record_pays, replace_pay
+from utils.bulk import MAX_BULK_ITEMS, insert_unordered, summarize
+from models.bulk import BulkItemResult, BulkResult
 
 coll = get_collection("pays")
 contracts_coll = get_collection("contracts")
 
 # ---------------- Función auxiliar ----------------
-def verify_pay_ownership(pay_doc, user_id: str) -> bool:
-    """Verifica si el pago pertenece al usuario propietario del contrato."""
-    contract_id = pay_doc.get("id_Contract")
-    if not contract_id:
-        return False
-    try:
-        oid_contract = ObjectId(contract_id)
-    except Exception:
-        oid_contract = None
-
-    contract = contracts_coll.find_one({"_id": oid_contract or contract_id})
-    if not contract:
-        return False
-    return str(contract.get("id_User")) == str(user_id)
+def is_owner(owner, user_id: str) -> bool:
+    """Verifica si el propietario del contrato es el usuario autenticado."""
+    return owner is not None and str(owner) == str(user_id)
 
 
 # Lista los pagos 
-async def get_Pay(request: Request, contract_id: str) -> list[Pay]:
-    """Obtiene todos los pagos de un contrato (admin ve todos, usuario solo los suyos)."""
+async def get_Pay(request: Request, contract_id: str, page: Page | None = None, projection: dict | None = None) -> list[dict]:
+    """Obtiene todos los pagos de un contrato (admin ve todos, usuario solo los suyos).
+    Devuelve los documentos listos para FastJSONResponse, sin construir modelos."""
     try:
         user_id = str(request.state.id)
         admin = getattr(request.state, "admin", False)
-        payments = []
+        page = page or Page()
+        pay_stages = page.window() + ([{"$project": projection}] if projection else [])
 
-        try:
-            oid_contract = ObjectId(contract_id)
-        except:
-            oid_contract = None
-
-        contract = contracts_coll.find_one({"_id": oid_contract or contract_id})
-        if not contract:
+        oid_contract = parse_object_id(contract_id)
+        pipeline = contract_pays_pipeline(oid_contract, pay_stages, page.with_total)
+        rows = await aggregate(contracts_coll, pipeline) if oid_contract else []
+        if not rows:
             raise HTTPException(404, "Contrato no encontrado")
 
-        if not admin and str(contract.get("id_User")) != user_id:
+        row = rows[0]
+        if not admin and not is_owner(row.get("owner"), user_id):
             raise HTTPException(403, "No autorizado")
 
-        query = {"id_Contract": contract_id}
-        if oid_contract:
-            query = {"$or": [{"id_Contract": contract_id}, {"id_Contract": oid_contract}]}
-
-        for doc in coll.find(query):
-            doc["id"] = str(doc["_id"])
-            del doc["_id"]
-            payments.append(Pay(**doc))
-        return payments
+        total = count_of(row["total"]) if page.with_total else None
+        return [to_api(doc, Pay, fill_defaults=not projection) for doc in page.finish(row["pays"], total)]
     except HTTPException:
         raise
     except Exception as e:
@@ -59,34 +49,29 @@ async def get_Pay(request: Request, contract_id: str) -> list[Pay]:
 
 
 # Lista un pago específico asociado a un contrato.
-async def get_Pay_by_id_contract(request: Request, contract_id: str, pay_id: str) -> Pay:
+async def get_Pay_by_id_contract(request: Request, contract_id: str, pay_id: str, projection: dict | None = None) -> Pay:
     """Obtiene un pago específico asociado a un contrato."""
     try:
         user_id = str(request.state.id)
         admin = getattr(request.state, "admin", False)
 
         oid_pay = ObjectId(pay_id)
-        try:
-            oid_contract = ObjectId(contract_id)
-        except:
-            oid_contract = None
-
-        query = {
-            "_id": oid_pay,
-            "$or": [{"id_Contract": contract_id}]
-        }
-        if oid_contract:
-            query["$or"].append({"id_Contract": oid_contract})
-
-        doc = coll.find_one(query)
-        if not doc:
+        oid_contract = parse_object_id(contract_id)
+
+        pipeline = pay_with_owner_pipeline(oid_pay, oid_contract)
+        if projection:
+            pipeline.append({"$project": {**projection, "owner": 1}})
+        rows = await aggregate(coll, pipeline) if oid_contract else []
+        if not rows:
             raise HTTPException(404, "Payment not found")
-        if not admin and not verify_pay_ownership(doc, user_id):
+        doc = rows[0]
+        owner = doc.pop("owner", None)
+        if not admin and not is_owner(owner, user_id):
             raise HTTPException(403, "No autorizado")
 
         doc["id"] = str(doc["_id"])
         del doc["_id"]
-        return Pay(**doc)
+        return PayPartial(**doc) if projection else Pay(**doc)
     except HTTPException:
         raise
     except Exception as e:
@@ -100,14 +85,15 @@ async def create_pay(request: Request, contract_id: str, pay: Pay) -> Pay:
         if not getattr(request.state, "admin", False):
             raise HTTPException(403, "Solo administradores pueden crear pagos")
 
-        contract = contracts_coll.find_one({"_id": ObjectId(contract_id)})
+        contract = await contracts_coll.find_one({"_id": ObjectId(contract_id)})
         if not contract:
             raise HTTPException(404, "Contrato no encontrado")
 
         data = pay.model_dump(exclude={"id"})
-        data["id_Contract"] = contract_id  
+        data["id_Contract"] = contract["_id"]
 
-        res = coll.insert_one(data)
+        res = await coll.insert_one(data)
+        await record_pay(data)
         data["id"] = str(res.inserted_id)
         return Pay(**data)
     except HTTPException:
@@ -116,6 +102,58 @@ async def create_pay(request: Request, contract_id: str, pay: Pay) -> Pay:
         raise HTTPException(500, f"Error creando pago: {e}")
 
 
+# Crea varios pagos de distintos contratos en una sola petición
+async def create_pays(request: Request, pays: list[Pay]) -> BulkResult:
+    """Crea pagos por lotes (solo administradores): valida todos los contratos con
+    una consulta $in e inserta los válidos con insert_many sin orden."""
+    try:
+        if not getattr(request.state, "admin", False):
+            raise HTTPException(403, "Solo administradores pueden crear pagos")
+        if len(pays) > MAX_BULK_ITEMS:
+            raise HTTPException(413, f"Máximo {MAX_BULK_ITEMS} pagos por petición")
+
+        results = []
+        pending = []  # (posición, documento)
+        for index, pay in enumerate(pays):
+            oid_contract = parse_object_id(pay.id_Contract)
+            if oid_contract is None:
+                results.append(BulkItemResult(index=index, status="error", error="id_Contract inválido"))
+                continue
+            data = pay.model_dump(exclude={"id"})
+            data["id_Contract"] = oid_contract
+            pending.append((index, data))
+
+        contract_ids = {data["id_Contract"] for _, data in pending}
+        existing = set()
+        if contract_ids:
+            cursor = contracts_coll.find({"_id": {"$in": list(contract_ids)}}, {"_id": 1})
+            existing = {doc["_id"] for doc in await cursor.to_list()}
+
+        valid = []
+        for index, data in pending:
+            if data["id_Contract"] in existing:
+                valid.append((index, data))
+            else:
+                results.append(BulkItemResult(index=index, status="error", error="Contrato no encontrado"))
+
+        docs = [data for _, data in valid]
+        errors = await insert_unordered(coll, docs)
+        inserted = []
+        for position, (index, data) in enumerate(valid):
+            if position in errors:
+                results.append(BulkItemResult(index=index, status="error", error=errors[position]))
+            else:
+                inserted.append(data)
+                results.append(BulkItemResult(index=index, status="created", id=str(data["_id"])))
+
+        await record_pays(inserted)
+        return summarize(results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error creando pagos: {e}")
+
+
 # Actualiza un pago
 async def update_Pay(request: Request, pay_id: str, pay: Pay) -> Pay:
     """Actualiza un pago (solo administradores)."""
@@ -124,12 +162,14 @@ async def update_Pay(request: Request, pay_id: str, pay: Pay) -> Pay:
             raise HTTPException(403, "Solo administradores pueden actualizar pagos")
 
         oid = ObjectId(pay_id)
-        data = pay.model_dump(exclude={"id"})
+        data = canonical_refs(pay.model_dump(exclude={"id"}), "pays")
 
-        if coll.update_one({"_id": oid}, {"$set": data}).matched_count == 0:
+        old = await coll.find_one_and_update({"_id": oid}, {"$set": data}, return_document=ReturnDocument.BEFORE)
+        if not old:
             raise HTTPException(404, "Pago no encontrado")
 
-        doc = coll.find_one({"_id": oid})
+        doc = {**old, **data}
+        await replace_pay(old, doc)
         doc["id"] = str(doc["_id"])
         del doc["_id"]
         return Pay(**doc)
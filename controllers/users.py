@@ -1,8 +1,9 @@
 import os
 import json
+import asyncio
 import logging
 import firebase_admin
-import requests
+import httpx
 import base64
 from fastapi import HTTPException
 from firebase_admin import credentials, auth as firebase_auth
@@ -13,6 +14,7 @@ from models.login import Login
 
 from utils.security import create_jwt_token
 from utils.mongodb import get_collection
+from utils.http_client import post_json
 
 load_dotenv()
 
@@ -44,11 +46,10 @@ def initialize_firebase():
         raise HTTPException(status_code=500, detail=f"Firebase configuration error: {str(e)}")
 
 
-initialize_firebase()
-
 async def create_user( user: User ) -> User:
 
     user_record = {}
+    initialize_firebase()
     try:
         user_record = firebase_auth.create_user(
             email=user.email
@@ -71,7 +72,7 @@ async def create_user( user: User ) -> User:
         )
 
         user_dict = new_user.model_dump(exclude={"id", "password"})
-        inserted = coll.insert_one(user_dict)
+        inserted = await coll.insert_one(user_dict)
         new_user.id = str(inserted.inserted_id)
         new_user.password = "*********"  # Mask the password in the response
         return new_user
@@ -91,17 +92,39 @@ async def login(user: Login) -> dict:
         , "returnSecureToken": True
     }
 
-    response = requests.post(url, json=payload)
-    response_data = response.json()
+    coll = get_collection("users")
+    # La búsqueda del usuario no depende de Firebase: ambas se hacen a la vez
+    sign_in, user_info = await asyncio.gather(
+        post_json(url, payload),
+        coll.find_one({ "email": user.email }, { "full_name": 1, "email": 1, "active": 1, "admin": 1 }),
+        return_exceptions=True
+    )
+    if isinstance(sign_in, httpx.HTTPError):
+        logger.error(f"Error contactando a Firebase: {sign_in!r}")
+        raise HTTPException(
+            status_code=503
+            , detail="Servicio de autenticación no disponible"
+        )
+    if isinstance(sign_in, Exception):
+        raise sign_in
 
-    if "error" in response_data:
+    try:
+        response_data = sign_in.json()
+    except ValueError:
+        # Firebase o un proxy intermedio respondió algo que no es JSON (p. ej. una página de error)
+        logger.error(f"Respuesta no JSON de Firebase ({sign_in.status_code}): {sign_in.text[:200]!r}")
+        raise HTTPException(
+            status_code=502
+            , detail="Respuesta inválida del servicio de autenticación"
+        )
+    if not isinstance(response_data, dict) or "error" in response_data:
         raise HTTPException(
             status_code=400
             , detail="Error al autenticar usuario"
         )
 
-    coll = get_collection("users")
-    user_info = coll.find_one({ "email": user.email })
+    if isinstance(user_info, Exception):
+        raise user_info
 
     if not user_info:
         raise HTTPException(
@@ -1,21 +1,86 @@
+import time
+IMPORT_STARTED = time.perf_counter()
+
+import os
+import asyncio
 import uvicorn
 import logging
 
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Depends
+from fastapi.responses import PlainTextResponse
 
-from controllers.users import create_user, login
+from controllers.users import create_user, login, initialize_firebase
 from models.users import User
 from models.login import Login
 
 from utils.security import validateuser, validateadmin
+from utils.indexes import sync_indexes
+from utils.invalidation import bus as invalidation_bus
+from utils.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
+from utils.metrics import MetricsMiddleware, render_metrics, check_metrics_token
+from utils.db_stats import DBStatsMiddleware, EMIT_HEADERS, COMMANDS_HEADER, TIME_HEADER, NAMES_HEADER
+from utils.mongodb import t_connection, get_pool_stats, ensure_slow_query_collection, warm_pool
+from utils.http_client import close_http_client
 
 from routes.Apartment import router as Apartment
 from routes.contract import router as contract
 from routes.maintenance_type import router as maintenance_type
 from routes.maintenance import router as maintenance
 from routes.pay import router as pay
+from routes.export import router as export
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def timed(timings: dict, name: str, step):
+    """Ejecuta un paso del arranque registrando su duración; los errores se registran sin detener la app"""
+    started = time.perf_counter()
+    try:
+        await step
+    except Exception as e:
+        logger.error(f"Error en el arranque ({name}): {e}")
+    timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+async def setup_database(timings: dict):
+    """Conexiones, índices y colección de consultas lentas, en orden"""
+    await timed(timings, "mongo_warm_pool", warm_pool())
+    # Sincroniza los índices declarados en utils/indexes.py (idempotente)
+    if os.getenv("MONGO_SYNC_INDEXES", "true").lower() == "true":
+        await timed(timings, "mongo_indexes", sync_indexes())
+    await timed(timings, "mongo_slow_queries", ensure_slow_query_collection())
+    # Versiones compartidas de los ETags (cache_versions)
+    await timed(timings, "cache_versions", invalidation_bus.load_versions())
+
+
+async def build_openapi():
+    app.openapi()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    timings = {"import": IMPORT_MS}
+    # Firebase (bloqueante) y MongoDB se inicializan en paralelo
+    await asyncio.gather(
+        timed(timings, "firebase", asyncio.to_thread(initialize_firebase)),
+        setup_database(timings),
+        timed(timings, "openapi", build_openapi()),
+    )
+    # Propaga las escrituras de otros workers a las cachés de este proceso
+    if os.getenv("CACHE_INVALIDATION", "true").lower() == "true":
+        invalidation_bus.start()
+    timings["startup"] = round((time.perf_counter() - started) * 1000, 1)
+    app.state.startup_timings = timings
+    logger.info(f"Arranque (ms): {timings}")
+    yield
+    await invalidation_bus.stop()
+    await close_http_client()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS
 from fastapi.middleware.cors import CORSMiddleware
@@ -25,16 +90,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all methods
     allow_headers=["*"],  # Allow all headers
+    # Paginación, caché y, si están activadas, comandos de MongoDB por petición
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, "ETag"]
+    + ([COMMANDS_HEADER, TIME_HEADER, NAMES_HEADER] if EMIT_HEADERS else []),
 )
 
+# Comandos de MongoDB por petición (cabeceras X-DB-* y log)
+app.add_middleware(DBStatsMiddleware)
+# Métricas por ruta; se agrega al final para que envuelva a los demás middlewares
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(Apartment)
 app.include_router(contract, tags=["📜 Contracts"])
 app.include_router(maintenance_type, tags=["🛠️ Maintenance Types"])
 app.include_router(maintenance, tags=["🧰 Maintenance"])
 app.include_router(pay)
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+app.include_router(export)
 
 @app.get("/")
 def read_root():
@@ -53,10 +124,9 @@ def health_check():
         return {"status": "unhealthy", "error": str(e)}
 
 @app.get("/ready")
-def readiness_check():
+async def readiness_check():
     try:
-        from utils.mongodb import test_connection
-        db_status = test_connection()
+        db_status = await t_connection()
         return {
             "status": "ready" if db_status else "not_ready",
             "database": "connected" if db_status else "disconnected",
@@ -65,6 +135,21 @@ def readiness_check():
     except Exception as e:
         return {"status": "not_ready", "error": str(e)}
 
+@app.get("/startup")
+def startup_timings():
+    """Duración de la importación y de cada paso del arranque, en ms"""
+    return getattr(app.state, "startup_timings", {})
+
+@app.get("/db/pool")
+@validateadmin
+async def pool_stats(request: Request):
+    return get_pool_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False,
+         dependencies=[Depends(check_metrics_token)])
+def metrics_endpoint():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.post("/users")
 async def create_user_endpoint(user: User) -> User:
     return await create_user(user)
@@ -114,6 +199,8 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
+IMPORT_MS = round((time.perf_counter() - IMPORT_STARTED) * 1000, 1)
+
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
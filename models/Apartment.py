@@ -27,4 +27,19 @@ class Apartment(BaseModel):
         description="Estado activo del apartamento"
     )
 
+    number_of_contracts: int = Field(
+        default=0,
+        description="Cantidad de contratos del apartamento (calculado, se ignora al escribir)"
+    )
+
+    active_contracts: int = Field(
+        default=0,
+        description="Cantidad de contratos activos (calculado, se ignora al escribir)"
+    )
+
+    pending_maintenances: int = Field(
+        default=0,
+        description="Cantidad de mantenimientos pendientes (calculado, se ignora al escribir)"
+    )
+
     
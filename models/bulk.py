@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class BulkItemResult(BaseModel):
+    index: int = Field(description="Posición del elemento en la petición")
+    status: str = Field(description="created, skipped o error", examples=["created"])
+    id: Optional[str] = Field(default=None, description="ID del documento creado")
+    error: Optional[str] = Field(default=None, description="Motivo por el que no se creó")
+
+
+class BulkResult(BaseModel):
+    created: int = Field(default=0, description="Cantidad de documentos creados")
+    skipped: int = Field(default=0, description="Cantidad de elementos omitidos por duplicados")
+    failed: int = Field(default=0, description="Cantidad de elementos rechazados")
+    results: list[BulkItemResult] = Field(default_factory=list, description="Resultado por elemento")
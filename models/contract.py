@@ -1,6 +1,8 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 from datetime import date
+from utils.references import object_id_to_str
+from utils.projection import partial_model
 
 class Contract(BaseModel):
     id: Optional[str] = Field(
@@ -28,3 +30,21 @@ class Contract(BaseModel):
         default=True,
         description="Indica si el contrato está activo"
     )
+
+    @field_validator('id_apartment', mode="before")
+    @classmethod
+    def stringify_object_ids(cls, value):
+        return object_id_to_str(value)
+
+
+ContractPartial = partial_model(Contract)
+
+
+class ContractSearchResult(Contract):
+    id_user: Optional[str] = Field(default=None, description="ID del inquilino")
+    apartment_number: Optional[str] = Field(default=None, description="Número del apartamento")
+
+    @field_validator('id_user', mode="before")
+    @classmethod
+    def stringify_user_id(cls, value):
+        return object_id_to_str(value)
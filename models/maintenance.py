@@ -1,6 +1,8 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 from datetime import datetime
+from utils.references import object_id_to_str
+from utils.projection import partial_model
 
 class Maintenance(BaseModel):
     id: Optional[str] = Field(
@@ -33,3 +35,17 @@ class Maintenance(BaseModel):
         default_factory=datetime.utcnow,
         description="Fecha del mantenimiento"
     )
+
+    status: str = Field(
+        default="pending",
+        description="Estado del mantenimiento",
+        examples=["pending", "done"]
+    )
+
+    @field_validator('id_Apartment', 'id_Contract', 'id_Maintenance_type', mode="before")
+    @classmethod
+    def stringify_object_ids(cls, value):
+        return object_id_to_str(value)
+
+
+MaintenancePartial = partial_model(Maintenance)
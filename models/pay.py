@@ -1,6 +1,8 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 from datetime import datetime
+from utils.references import object_id_to_str
+from utils.projection import partial_model
 
 class Pay(BaseModel):
     id: Optional[str] = Field(
@@ -33,3 +35,11 @@ class Pay(BaseModel):
         default=True,
         description="Indica si el pago está realizado"
     )
+
+    @field_validator('id_Contract', mode="before")
+    @classmethod
+    def stringify_object_ids(cls, value):
+        return object_id_to_str(value)
+
+
+PayPartial = partial_model(Pay)
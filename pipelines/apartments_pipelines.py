@@ -1,32 +1,19 @@
 from bson import ObjectId
 
 def get_apartments_pipeline() -> list:
-    """Pipeline para obtener apartamentos con la cantidad de contratos"""
+    """Pipeline para obtener apartamentos con sus contadores (mantenidos en cada escritura)"""
     return [
-        {
-            "$addFields": {"id": {"$toString": "$_id"}}
-        },
-        {
-            "$lookup": {
-                "from": "contracts",
-                "localField": "id",
-                "foreignField": "id_apartment",
-                "as": "contracts_list"
-            }
-        },
-        {
-            "$addFields": {
-                "number_of_contracts": {"$size": "$contracts_list"}
-            }
-        },
         {
             "$project": {
                 "_id": 0,
-                "id": 1,
+                "id": {"$toString": "$_id"},
                 "number": 1,
                 "level": 1,
+                "active": 1,
                 "status": 1,
-                "number_of_contracts": 1
+                "number_of_contracts": {"$ifNull": ["$number_of_contracts", 0]},
+                "active_contracts": {"$ifNull": ["$active_contracts", 0]},
+                "pending_maintenances": {"$ifNull": ["$pending_maintenances", 0]}
             }
         }
     ]
@@ -39,7 +26,7 @@ def validate_apartment_has_contracts_pipeline(apartment_id: str) -> list:
         {
             "$lookup": {
                 "from": "contracts",
-                "localField": "id",
+                "localField": "_id",
                 "foreignField": "id_apartment",
                 "as": "contracts_list"
             }
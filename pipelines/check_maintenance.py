@@ -11,39 +11,19 @@ async def check_maintenance_pipeline(apartment_id: str):
         except:
             raise HTTPException(status_code=400, detail="ID de apartamento inválido")
 
-        pipeline = [
-            {"$match": {"_id": oid_apartment}},
-            {"$lookup": {
-                    "from": "maintenance",
-                    "localField": "_id",
-                    "foreignField": "apartment_id",
-                    "as": "maintenances"
-                }
-            },
-            {"$project": {
-                "_id": 0,
-                "id": {"$toString": "$_id"},
-                    "pending_count": {"$size": {"$filter": {
-                                "input": "$maintenances",
-                                "cond": {"$eq": ["$$this.status", "pending"]}
-                            }
-                        }
-                    }
-                }
-            },
-            {"$match": {"pending_count": {"$gt": 2}}}
-        ]
-
-        result = list(apartments_coll.aggregate(pipeline))
-        if not result:
+        # pending_maintenances lo mantienen las escrituras de mantenimientos
+        doc = await apartments_coll.find_one(
+            {"_id": oid_apartment, "pending_maintenances": {"$gt": 2}},
+            {"pending_maintenances": 1}
+        )
+        if not doc:
             return {"message": "El apartamento tiene 2 o menos mantenimientos pendientes."}
         else:
             return {
                 "message": "El apartamento tiene más de 2 mantenimientos pendientes. Requiere atención.",
-                "data": result[0]
+                "data": {"id": str(doc["_id"]), "pending_count": doc["pending_maintenances"]}
             }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error validando mantenimiento: {str(e)}")
-
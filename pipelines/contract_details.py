@@ -1,40 +1,20 @@
-from fastapi import Request, HTTPException
 from bson import ObjectId
-from utils.mongodb import get_collection
+from fastapi import Request, HTTPException
+from utils.mongodb import get_collection, aggregate
+from utils.references import parse_object_id
 
 coll = get_collection("pays")
 contracts_coll = get_collection("contracts")
 
-async def get_pays_with_contract_details(request: Request, contract_id: str):
-    """Obtiene pagos de un contrato con detalles de contrato usando $lookup."""
-    user_id = str(request.state.id)
-    admin = getattr(request.state, "admin", False)
-
-    try:
-        oid_contract = ObjectId(contract_id)
-    except:
-        oid_contract = None
-
-    contract = contracts_coll.find_one({"_id": oid_contract})
-    if not contract:
-        raise HTTPException(404, "Contrato no encontrado")
-    if not admin and str(contract.get("id_User")) != user_id:
-        raise HTTPException(403, "No autorizado")
-
-    pipeline = [
-        {"$match": {"$or": [{"id_Contract": contract_id}, {"contract_id": contract_id}]}},
+def pays_with_contract_details_pipeline(contract_id: ObjectId) -> list:
+    """Pipeline sobre pays: pagos de un contrato con los datos del contrato"""
+    return [
+        {"$match": {"id_Contract": contract_id}},
         {
             "$lookup": {
                 "from": "contracts",
-                "let": {"cid1": "$id_Contract", "cid2": "$contract_id"},
-                "pipeline": [
-                    {"$match": {
-                        "$expr": {"$or": [
-                            {"$eq": ["$_id", {"$toObjectId": "$$cid1"}]},
-                            {"$eq": ["$_id", {"$toObjectId": "$$cid2"}]}
-                        ]}
-                    }}
-                ],
+                "localField": "id_Contract",
+                "foreignField": "_id",
                 "as": "contract_info"
             }
         },
@@ -46,13 +26,7 @@ async def get_pays_with_contract_details(request: Request, contract_id: str):
                 "cost": 1,
                 "is_paid": 1,
                 "date": 1,
-                "id_Contract": {
-                    "$cond": {
-                        "if": {"$eq": [{"$type": "$id_Contract"}, "objectId"]},
-                        "then": {"$toString": "$id_Contract"},
-                        "else": "$id_Contract"
-                    }
-                },
+                "id_Contract": {"$toString": "$id_Contract"},
                 "contract": {
                     "id": {"$toString": "$contract_info._id"},
                     "start_date": "$contract_info.start_date",
@@ -62,4 +36,17 @@ async def get_pays_with_contract_details(request: Request, contract_id: str):
         }
     ]
 
-    return list(coll.aggregate(pipeline))
+
+async def get_pays_with_contract_details(request: Request, contract_id: str):
+    """Obtiene pagos de un contrato con detalles de contrato usando $lookup."""
+    user_id = str(request.state.id)
+    admin = getattr(request.state, "admin", False)
+
+    oid_contract = parse_object_id(contract_id)
+    contract = await contracts_coll.find_one({"_id": oid_contract}) if oid_contract else None
+    if not contract:
+        raise HTTPException(404, "Contrato no encontrado")
+    if not admin and str(contract.get("id_User")) != user_id:
+        raise HTTPException(403, "No autorizado")
+
+    return await aggregate(coll, pays_with_contract_details_pipeline(oid_contract))
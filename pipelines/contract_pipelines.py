@@ -2,6 +2,7 @@
 Pipelines de MongoDB para operaciones con contratos
 """
 from bson import ObjectId
+from utils.contract_search import prefix_filter
 
 def get_contract_with_apartment_pipeline(contract_id: str) -> list:
     """
@@ -9,12 +10,9 @@ def get_contract_with_apartment_pipeline(contract_id: str) -> list:
     """
     return [
         {"$match": {"_id": ObjectId(contract_id)}},
-        {"$addFields": {
-            "id_apartment_obj": {"$toObjectId": "$id_apartment"}
-        }},
         {"$lookup": {
             "from": "apartments",
-            "localField": "id_apartment_obj",
+            "localField": "id_apartment",
             "foreignField": "_id",
             "as": "apartment"
         }},
@@ -34,12 +32,9 @@ def get_all_contracts_with_apartments_pipeline(skip: int = 0, limit: int = 10) -
     Pipeline para obtener todos los contratos con información del apartamento relacionado
     """
     return [
-        {"$addFields": {
-            "id_apartment_obj": {"$toObjectId": "$id_apartment"}
-        }},
         {"$lookup": {
             "from": "apartments",
-            "localField": "id_apartment_obj",
+            "localField": "id_apartment",
             "foreignField": "_id",
             "as": "apartment"
         }},
@@ -63,12 +58,9 @@ def validate_contract_has_apartments_pipeline(contract_id: str) -> list:
     """
     return [
         {"$match": {"_id": ObjectId(contract_id)}},
-        {"$addFields": {
-            "id_apartment_obj": {"$toObjectId": "$id_apartment"}
-        }},
         {"$lookup": {
             "from": "apartments",
-            "localField": "id_apartment_obj",
+            "localField": "id_apartment",
             "foreignField": "_id",
             "as": "apartments"
         }},
@@ -89,38 +81,24 @@ def validate_contract_has_apartments_pipeline(contract_id: str) -> list:
         }}
     ]
 
-def search_contracts_pipeline(search_term: str, skip: int = 0, limit: int = 10) -> list:
+def search_contracts_pipeline(search_term: str, page) -> list:
     """
-    Pipeline para buscar contratos por id_user o apartamento relacionado
+    Pipeline para buscar contratos por prefijo del número de apartamento o del
+    inquilino. Filtra con el índice search_keys y pagina antes de unir apartments,
+    así el lookup solo se hace para los contratos de la página.
     """
-    return [
-        {"$addFields": {
-            "id_apartment_obj": {"$toObjectId": "$id_apartment"}
-        }},
+    join = [
         {"$lookup": {
             "from": "apartments",
-            "localField": "id_apartment_obj",
+            "localField": "id_apartment",
             "foreignField": "_id",
+            "pipeline": [{"$project": {"number": 1}}],
             "as": "apartment"
         }},
-        {"$unwind": "$apartment"},
-        {"$match": {
-            "$or": [
-                {"id_user": {"$regex": search_term, "$options": "i"}},
-                {"apartment.number": {"$regex": search_term, "$options": "i"}}
-            ]
-        }},
-        {"$project": {
-            "id": {"$toString": "$_id"},
-            "id_user": {"$toString": "$id_user"},
-            "tipo": "$apartment.number",
-            "start_date": "$start_date",
-            "end_date": "$end_date",
-            "status": "$status"
-        }},
-        {"$skip": skip},
-        {"$limit": limit}
+        {"$set": {"apartment_number": {"$arrayElemAt": ["$apartment.number", 0]}}},
+        {"$project": {"apartment": 0, "search_keys": 0}}
     ]
+    return page.pipeline([{"$match": prefix_filter(search_term)}], join)
 
 
 def get_contracts_pipeline():
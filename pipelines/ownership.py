@@ -0,0 +1,82 @@
+"""
+Pipelines de MongoDB que resuelven el documento y su propietario en una sola consulta.
+
+Cada pipeline devuelve, junto al documento, el campo "owner" (id_User del
+contrato) para que el controlador decida entre 404 y 403 sin otra ida a la base.
+"""
+from bson import ObjectId
+
+
+def contract_pays_pipeline(contract_id: ObjectId, pay_stages: list, with_total: bool = False) -> list:
+    """
+    Pipeline sobre contracts: devuelve el propietario del contrato y sus pagos.
+    pay_stages limita los pagos (paginación); with_total agrega el conteo completo.
+    """
+    lookups = [{"$lookup": {
+        "from": "pays",
+        "localField": "_id",
+        "foreignField": "id_Contract",
+        "pipeline": pay_stages,
+        "as": "pays"
+    }}]
+    if with_total:
+        lookups.append({"$lookup": {
+            "from": "pays",
+            "localField": "_id",
+            "foreignField": "id_Contract",
+            "pipeline": [{"$count": "count"}],
+            "as": "total"
+        }})
+    return [
+        {"$match": {"_id": contract_id}},
+        *lookups,
+        {"$project": {"_id": 0, "owner": "$id_User", "pays": 1, "total": 1}}
+    ]
+
+
+def pay_with_owner_pipeline(pay_id: ObjectId, contract_id: ObjectId) -> list:
+    """Pipeline sobre pays: obtiene un pago de un contrato junto al propietario del contrato"""
+    return [
+        {"$match": {"_id": pay_id, "id_Contract": contract_id}},
+        {"$lookup": {
+            "from": "contracts",
+            "localField": "id_Contract",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"_id": 0, "id_User": 1}}],
+            "as": "contract"
+        }},
+        {"$addFields": {"owner": {"$arrayElemAt": ["$contract.id_User", 0]}}},
+        {"$project": {"contract": 0}}
+    ]
+
+
+def maintenance_with_owner_pipeline(maintenance_id: ObjectId) -> list:
+    """Pipeline sobre maintenance: obtiene un mantenimiento junto al propietario de su contrato"""
+    return [
+        {"$match": {"_id": maintenance_id}},
+        {"$lookup": {
+            "from": "contracts",
+            "localField": "id_Contract",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"_id": 0, "id_User": 1}}],
+            "as": "contract"
+        }},
+        {"$addFields": {"owner": {"$arrayElemAt": ["$contract.id_User", 0]}}},
+        {"$project": {"contract": 0}}
+    ]
+
+
+def user_maintenances_pipeline(user_id: ObjectId) -> list:
+    """Pipeline sobre contracts: todos los mantenimientos de los contratos de un usuario"""
+    return [
+        {"$match": {"id_User": user_id}},
+        {"$project": {"_id": 1}},
+        {"$lookup": {
+            "from": "maintenance",
+            "localField": "_id",
+            "foreignField": "id_Contract",
+            "as": "maintenance"
+        }},
+        {"$unwind": "$maintenance"},
+        {"$replaceRoot": {"newRoot": "$maintenance"}}
+    ]
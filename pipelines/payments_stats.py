@@ -1,31 +1,21 @@
 from fastapi import HTTPException
 from utils.mongodb import get_collection
+from utils.pay_stats import STATS_COLLECTION
 
-payments_coll = get_collection("pays")
+stats_coll = get_collection(STATS_COLLECTION)
 
 
 async def get_payments_stats_pipeline():
-    """Pipeline que agrupa pagos y devuelve estadísticas por contrato."""
+    """Estadísticas de pagos por contrato, leídas de pay_stats (mantenidas en cada escritura)."""
     try:
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$contract_id",
-                    "total_payments": {"$sum": 1},
-                    "total_amount": {"$sum": "$cost"},
-                    "avg_amount": {"$avg": "$cost"}
-                }
-            },
-            {
-                "$project": {
-                    "contract_id": {"$toString": "$_id"},
-                    "total_payments": 1,
-                    "total_amount": 1,
-                    "avg_amount": 1,
-                    "_id": 0
-                }
-            }
-        ]
-        return list(payments_coll.aggregate(pipeline))
+        result = []
+        async for doc in stats_coll.find({"count": {"$gt": 0}}):
+            result.append({
+                "contract_id": str(doc["_id"]),
+                "total_payments": doc["count"],
+                "total_amount": doc["sum"],
+                "avg_amount": doc["sum"] / doc["count"]
+            })
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error ejecutando pipeline de estadísticas: {str(e)}")
@@ -1,17 +1,15 @@
-from utils.mongodb import get_collection
+from utils.mongodb import get_collection, aggregate
 
 coll = get_collection("pays")
 
-async def get_pays_pending_validation(request):
-    """Devuelve pagos pendientes o contratos inactivos."""
-    pipeline = [
+def pays_pending_validation_pipeline() -> list:
+    """Pipeline sobre pays: pagos pendientes o de contratos inactivos"""
+    return [
         {
             "$lookup": {
                 "from": "contracts",
-                "let": {"cid": "$id_Contract"},
-                "pipeline": [
-                    {"$match": {"$expr": {"$eq": ["$_id", {"$toObjectId": "$$cid"}]}}}
-                ],
+                "localField": "id_Contract",
+                "foreignField": "_id",
                 "as": "contract_info"
             }
         },
@@ -28,4 +26,8 @@ async def get_pays_pending_validation(request):
             }
         }
     ]
-    return list(coll.aggregate(pipeline))
+
+
+async def get_pays_pending_validation(request):
+    """Devuelve pagos pendientes o contratos inactivos."""
+    return await aggregate(coll, pays_pending_validation_pipeline())
@@ -1,14 +1,15 @@
-from utils.mongodb import get_collection
+from utils.mongodb import get_collection, aggregate
+from utils.pagination import Page
 
 coll = get_collection("apartments")
 
-async def get_apartments_public(active: str | None = None, limit: int = 10, skip: int = 0):
-    """Obtiene lista pública de apartamentos con filtros y paginación."""
+async def get_apartments_public(active: str | None = None, page: Page | None = None):
+    """Obtiene lista pública de apartamentos con filtros y paginación por cursor."""
     query = {"active": active.lower() == "true"} if active else {}
-    cursor = coll.find(query).skip(skip).limit(limit)
+    page = page or Page(limit=10)
 
     result = []
-    for doc in cursor:
+    for doc in page.unpack(await aggregate(coll, page.pipeline([{"$match": query}]))):
         doc["id"] = str(doc["_id"])
         del doc["_id"]
         result.append(doc)
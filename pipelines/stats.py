@@ -1,30 +1,28 @@
 from fastapi import Request
-from bson import ObjectId
 from utils.mongodb import get_collection
+from utils.references import parse_object_id
+from utils.pay_stats import STATS_COLLECTION
 
-coll = get_collection("pays")
+stats_coll = get_collection(STATS_COLLECTION)
 
 async def get_pay_stats_by_contract(request: Request, contract_id: str):
-    """Usa $group para sumar y promediar pagos de un contrato."""
-    try:
-        oid_contract = ObjectId(contract_id)
-    except:
-        oid_contract = None
+    """Lee las estadísticas mantenidas de los pagos de un contrato (sin recorrer pays)."""
+    oid_contract = parse_object_id(contract_id)
+    if not oid_contract:
+        return []
 
-    pipeline = [
-        {"$match": {"$or": [{"id_Contract": contract_id}, {"id_Contract": oid_contract}]}},
-        {"$group": {
-            "_id": "$id_Contract",
-            "total_pagos": {"$sum": 1},
-            "suma": {"$sum": "$cost"},
-            "promedio": {"$avg": "$cost"}
-        }},
-        {"$project": {
-            "_id": 0,
-            "contract_id": "$_id",
-            "total_pagos": 1,
-            "suma": 1,
-            "promedio": 1
-        }}
-    ]
-    return list(coll.aggregate(pipeline))
+    doc = await stats_coll.find_one({"_id": oid_contract})
+    if not doc or not doc.get("count"):
+        return []
+
+    return [{
+        "contract_id": str(doc["_id"]),
+        "total_pagos": doc["count"],
+        "suma": doc["sum"],
+        "promedio": doc["sum"] / doc["count"],
+        "pagados": doc.get("paid_count", 0),
+        "suma_pagados": doc.get("paid_sum", 0),
+        "pendientes": doc.get("unpaid_count", 0),
+        "suma_pendientes": doc.get("unpaid_sum", 0),
+        "ultimo_pago": doc.get("last_payment_date")
+    }]
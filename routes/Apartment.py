@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, Request, Query, Body
+from fastapi import APIRouter, HTTPException, Request, Response, Query, Body, Depends
 from models.Apartment import Apartment
+from models.bulk import BulkResult
 from controllers.Apartment import (
     create_Apartment,
+    import_apartments,
     get_Apartment,
     get_Apartment_id,
     update_Apartment,
@@ -9,6 +11,10 @@ from controllers.Apartment import (
     toggle_apartment_status
 )
 from utils.security import validateuser
+from utils.pagination import Page
+from utils.fast_json import FastJSONResponse
+from utils.imports import detect_format
+from utils.etag import etag_for, matches, not_modified
 
 router = APIRouter()
 
@@ -19,16 +25,35 @@ async def create_apartment_endpoint(request: Request, apartment: Apartment) -> A
     return await create_Apartment(apartment)
 
 
+# Importar apartamentos desde un archivo CSV o NDJSON (cuerpo de la petición)
+@router.post("/apartments/import", response_model=BulkResult, tags=["🏢 Apartments"])
+@validateuser
+async def import_apartments_endpoint(
+    request: Request,
+    format: str | None = Query(None, description="csv o ndjson; por defecto según Content-Type")
+) -> BulkResult:
+    fmt = detect_format(request.headers.get("content-type"), format)
+    return await import_apartments(request.stream(), fmt)
+
+
 # Obtener todos los apartamentos
 @router.get("/apartments", response_model=list[Apartment], tags=["🏢 Apartments"])
-async def get_apartments_endpoint() -> list[Apartment]:
-    return await get_Apartment()
+async def get_apartments_endpoint(request: Request, page: Page = Depends()) -> list[Apartment]:
+    etag = etag_for(request, "apartments")
+    if matches(request, etag):
+        return not_modified(etag)
+    return FastJSONResponse(await get_Apartment(page), headers={**page.headers, "ETag": etag})
 
 
 # Obtener un apartamento por ID 
 @router.get("/apartments/{apartment_id}", response_model=Apartment, tags=["🏢 Apartments"])
-async def get_apartment_by_id_endpoint(apartment_id: str) -> Apartment:
-    return await get_Apartment_id(apartment_id)
+async def get_apartment_by_id_endpoint(request: Request, response: Response, apartment_id: str) -> Apartment:
+    etag = etag_for(request, "apartments")
+    if matches(request, etag):
+        return not_modified(etag)
+    apartment = await get_Apartment_id(apartment_id)
+    response.headers["ETag"] = etag
+    return apartment
 
 
 # Actualizar un apartamento 
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Request
-from models.contract import Contract
+from fastapi import APIRouter, Request, Depends, Query
+from utils.contract_search import MIN_SEARCH_LENGTH
+from models.contract import Contract, ContractPartial, ContractSearchResult
+from utils.security import validateadmin
+from utils.projection import projection_for
+from utils.pagination import Page
+from utils.fast_json import FastJSONResponse
 from controllers.contract import (
     get_contracts,
+    search_contracts,
     create_contract,
     get_contract_by_id,
     update_contract,
@@ -12,9 +18,15 @@ router = APIRouter()
 
 
 # Listar todos los contratos
-@router.get("/contracts", response_model=list[Contract])
-async def read_contracts(request: Request):
-    return await get_contracts(request)
+@router.get("/contracts", response_model=list[ContractPartial], response_model_exclude_none=True)
+async def read_contracts(request: Request, page: Page = Depends(), projection: dict | None = Depends(projection_for(Contract))):
+    return FastJSONResponse(await get_contracts(request, page, projection), headers=page.headers)
+
+# Buscar contratos por prefijo del número de apartamento o del inquilino
+@router.get("/contracts/search", response_model=list[ContractSearchResult])
+@validateadmin
+async def search_contracts_endpoint(request: Request, q: str = Query(..., min_length=MIN_SEARCH_LENGTH, max_length=50), page: Page = Depends()):
+    return FastJSONResponse(await search_contracts(q, page), headers=page.headers)
 
 # Crear un nuevo contrato 
 @router.post("/contracts", response_model=Contract)
@@ -23,9 +35,9 @@ async def create_contract_endpoint(contract: Contract):
 
 
 # Obtener contrato por ID 
-@router.get("/contracts/{contract_id}", response_model=Contract)
-async def get_contract_by_id_endpoint(request: Request, contract_id: str) -> Contract:
-    return await get_contract_by_id(request, contract_id)
+@router.get("/contracts/{contract_id}", response_model=ContractPartial, response_model_exclude_none=True)
+async def get_contract_by_id_endpoint(request: Request, contract_id: str, projection: dict | None = Depends(projection_for(Contract))) -> Contract:
+    return await get_contract_by_id(request, contract_id, projection)
 
 # Actualizar contrato
 @router.put("/contracts/{contract_id}", response_model=Contract)
@@ -0,0 +1,23 @@
+from datetime import date
+from typing import Literal
+
+from fastapi import APIRouter, Request, Query
+from utils.security import validateadmin
+from controllers.export import export_collection
+
+router = APIRouter()
+
+
+@router.get("/export/{name}", tags=["📤 Export"])
+@validateadmin
+async def export_endpoint(
+    request: Request,
+    name: Literal["pays", "contracts", "maintenances"],
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Formato de salida"),
+    from_date: date | None = Query(None, description="Fecha inicial (inclusive, AAAA-MM-DD)"),
+    to_date: date | None = Query(None, description="Fecha final (inclusive, AAAA-MM-DD)"),
+    contract_id: str | None = Query(None, description="Filtra por contrato"),
+    is_paid: bool | None = Query(None, description="Solo para pagos"),
+):
+    """Exporta pagos, contratos o mantenimientos en streaming (NDJSON o CSV)"""
+    return await export_collection(name, format, from_date, to_date, contract_id, is_paid)
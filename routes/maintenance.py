@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Depends
 from typing import List
-from models.maintenance import Maintenance
+from utils.pagination import Page
+from utils.fast_json import FastJSONResponse
+from models.maintenance import Maintenance, MaintenancePartial
+from models.bulk import BulkResult
+from utils.projection import projection_for
 from utils.security import validateuser, validateadmin
 from controllers.maintenance import (
     get_all_maintenances,
     get_maintenance_by_id,
     create_maintenance,
+    create_maintenances,
     update_maintenance,
     deactivate_maintenance
 )
@@ -13,21 +18,26 @@ from controllers.maintenance import (
 router = APIRouter()
 
 
-@router.get("/maintenances", response_model=List[Maintenance])
+@router.get("/maintenances", response_model=List[MaintenancePartial], response_model_exclude_none=True)
 @validateuser
-async def list_maintenances(request: Request):
-    return await get_all_maintenances(request)
+async def list_maintenances(request: Request, page: Page = Depends(), projection: dict | None = Depends(projection_for(Maintenance))):
+    return FastJSONResponse(await get_all_maintenances(request, page, projection), headers=page.headers)
 
-@router.get("/maintenances/{maintenance_id}", response_model=Maintenance)
+@router.get("/maintenances/{maintenance_id}", response_model=MaintenancePartial, response_model_exclude_none=True)
 @validateuser
-async def get_maintenance_endpoint(request: Request, maintenance_id: str):
-    return await get_maintenance_by_id(request, maintenance_id)
+async def get_maintenance_endpoint(request: Request, maintenance_id: str, projection: dict | None = Depends(projection_for(Maintenance))):
+    return await get_maintenance_by_id(request, maintenance_id, projection)
 
 @router.post("/maintenances", response_model=Maintenance)
 @validateadmin
 async def create_maintenance_endpoint(request: Request, m: Maintenance):
     return await create_maintenance(request, m)
 
+@router.post("/maintenances/lote", response_model=BulkResult)
+@validateadmin
+async def create_maintenances_endpoint(request: Request, items: List[Maintenance]):
+    return await create_maintenances(request, items)
+
 @router.put("/maintenances/{maintenance_id}", response_model=Maintenance)
 @validateadmin
 async def update_maintenance_endpoint(request: Request, maintenance_id: str, m: Maintenance):
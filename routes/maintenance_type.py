@@ -1,5 +1,8 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Depends
 from utils.security import validateuser, validateadmin
+from utils.pagination import Page
+from utils.fast_json import FastJSONResponse
+from utils.etag import etag_for, matches, not_modified
 from models.maintenance_type import Maintenance_Type
 from controllers.maintenance_type import (
     get_all_maintenance_types,
@@ -14,8 +17,11 @@ router = APIRouter()
 
 @router.get("/maintenance_types", response_model=list[Maintenance_Type])
 @validateuser
-async def list_maintenance_types(request: Request):
-    return await get_all_maintenance_types()
+async def list_maintenance_types(request: Request, page: Page = Depends()):
+    etag = etag_for(request, "maintenance_types")
+    if matches(request, etag):
+        return not_modified(etag)
+    return FastJSONResponse(await get_all_maintenance_types(page), headers={**page.headers, "ETag": etag})
 
 @router.get("/maintenance_types/{type_id}", response_model=Maintenance_Type)
 @validateuser
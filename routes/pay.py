@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Depends
 from utils.security import validateuser, validateadmin
-from models.pay import Pay
+from utils.pagination import Page
+from utils.fast_json import FastJSONResponse
+from models.pay import Pay, PayPartial
+from models.bulk import BulkResult
+from utils.projection import projection_for
 from controllers.pay import (
-    get_Pay, get_Pay_by_id_contract, create_pay, update_Pay,
+    get_Pay, get_Pay_by_id_contract, create_pay, create_pays, update_Pay,
 )
 
 from pipelines.contract_details import get_pays_with_contract_details
@@ -14,17 +18,17 @@ from pipelines.payments_stats import get_payments_stats_pipeline
 router = APIRouter()
 
 # CRUD - Pagos
-@router.get("/contratos/{contract_id}/pagos", response_model=list[Pay], tags=["💰 Payments"])
+@router.get("/contratos/{contract_id}/pagos", response_model=list[PayPartial], response_model_exclude_none=True, tags=["💰 Payments"])
 @validateuser
-async def read_pays_by_contract(request: Request, contract_id: str):
+async def read_pays_by_contract(request: Request, contract_id: str, page: Page = Depends(), projection: dict | None = Depends(projection_for(Pay))):
     """Obtiene todos los pagos de un contrato"""
-    return await get_Pay(request, contract_id)
+    return FastJSONResponse(await get_Pay(request, contract_id, page, projection), headers=page.headers)
 
-@router.get("/contratos/{contract_id}/pagos/{pay_id}", response_model=Pay, tags=["💰 Payments"])
+@router.get("/contratos/{contract_id}/pagos/{pay_id}", response_model=PayPartial, response_model_exclude_none=True, tags=["💰 Payments"])
 @validateuser
-async def read_pay_by_contract(request: Request, contract_id: str, pay_id: str):
+async def read_pay_by_contract(request: Request, contract_id: str, pay_id: str, projection: dict | None = Depends(projection_for(Pay))):
     """Obtiene un pago específico asociado a un contrato"""
-    return await get_Pay_by_id_contract(request, contract_id, pay_id)
+    return await get_Pay_by_id_contract(request, contract_id, pay_id, projection)
 
 @router.post("/contratos/{contract_id}/pagos", response_model=Pay, tags=["💰 Payments"])
 @validateadmin
@@ -32,6 +36,12 @@ async def route_create_pay(request: Request, contract_id: str, pay: Pay):
     """Crea un pago asociado a un contrato"""
     return await create_pay(request, contract_id, pay)
 
+@router.post("/pagos/lote", response_model=BulkResult, tags=["💰 Payments"])
+@validateadmin
+async def route_create_pays(request: Request, pays: list[Pay]):
+    """Crea varios pagos (de uno o más contratos) en una sola petición"""
+    return await create_pays(request, pays)
+
 @router.put("/pagos/{pay_id}", response_model=Pay, tags=["💰 Payments"])
 @validateadmin
 async def route_update_pay(request: Request, pay_id: str, pay: Pay):
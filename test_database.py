@@ -1,6 +1,18 @@
 import os
+import time
+import asyncio
 import pytest
-from utils.mongodb import get_mongo_client, t_connection, get_collection
+from types import SimpleNamespace
+from utils.mongodb import get_mongo_client, t_connection, get_collection, redact
+from utils import db_stats
+from utils.db_stats import command_stats, track_commands, assert_max_commands, DBStatsMiddleware
+from fastapi import HTTPException
+from utils.fast_json import to_api
+from utils.pagination import encode_cursor, decode_cursor
+from utils import security
+from utils.projection import parse_fields
+from models.pay import Pay
+from bson import ObjectId
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,7 +27,7 @@ def test_env_variables():
 
 def test_connect():
     try:
-        connection_result = t_connection()
+        connection_result = asyncio.run(t_connection())
         assert connection_result is True, "La conexion a la BD Fallo"
     except Exception as e:
         pytest.fail(f"Error en la conexion a MongoDB {str(e)}")
@@ -37,7 +49,157 @@ def test_get_collection():
         pytest.fail(f"Error en el llamado del cliente {str(e)}")
 
 
+def _command(name):
+    command_stats.started(SimpleNamespace(command_name=name))
+    command_stats.succeeded(SimpleNamespace(command_name=name, duration_micros=1500))
 
 
+def test_track_commands():
+    with track_commands() as stats:
+        _command("find")
+        _command("find")
+        _command("aggregate")
+    _command("find")  # fuera del bloque no se cuenta
+    assert stats.commands == 3, "track_commands no conto los comandos del bloque"
+    assert stats.time_ms == 4.5
+    assert stats.summary() == "find:2,aggregate:1"
 
 
+def test_assert_max_commands(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+
+    @app.get("/n-mas-uno")
+    async def n_plus_one():
+        for _ in range(3):
+            _command("find")
+        return {}
+
+    monkeypatch.setattr(db_stats, "EMIT_HEADERS", True)
+    app.add_middleware(DBStatsMiddleware)
+    response = TestClient(app).get("/n-mas-uno")
+
+    assert_max_commands(response, 3)
+    with pytest.raises(AssertionError):
+        assert_max_commands(response, 2)
+
+
+def test_to_api_projected_document():
+    oid = ObjectId()
+    # Con ?fields=id,cost solo llegan esos campos: no se inventan date ni is_paid
+    assert to_api({"_id": oid, "cost": 5.0}, Pay, fill_defaults=False) == {"id": str(oid), "cost": 5.0}
+
+
+def test_to_api_fills_defaults():
+    out = to_api({"_id": ObjectId(), "id_Contract": "c", "cost": 5.0}, Pay)
+    assert out["is_paid"] == Pay.model_fields["is_paid"].default
+    assert "date" in out
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    assert decode_cursor(encode_cursor(oid)) == oid
+
+
+@pytest.mark.parametrize("cursor", ["é", "%%", "abc", ""])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+@pytest.fixture
+def token_cache(monkeypatch):
+    monkeypatch.setattr(security, "SECRET_KEY", "clave-de-pruebas-de-al-menos-32-bytes")
+    security._token_cache.clear()
+    for key in security.auth_cache_stats:
+        monkeypatch.setitem(security.auth_cache_stats, key, 0)
+    yield security
+    security._token_cache.clear()
+
+
+def _token(id="1", active=True, admin=False):
+    return security.create_jwt_token("Prueba", f"{id}@example.com", active, admin, id)
+
+
+def test_token_cache_hit(token_cache):
+    token = _token()
+    first = token_cache.authenticate(token)
+    second = token_cache.authenticate(token)
+    assert second is first, "El segundo acceso deberia salir de la cache"
+    assert token_cache.auth_cache_stats["hits"] == 1
+    assert token_cache.auth_cache_stats["misses"] == 1
+
+
+def test_token_cache_rejects_expired_entry(token_cache, monkeypatch):
+    token = _token()
+    token_cache.authenticate(token)
+    # Dos horas después el token (1 h) ya venció aunque siga en la caché
+    later = time.time() + 2 * 3600
+    monkeypatch.setattr(security.time, "time", lambda: later)
+    with pytest.raises(HTTPException) as exc:
+        token_cache.authenticate(token)
+    assert exc.value.status_code == 401
+    assert token_cache.auth_cache_stats["hits"] == 0
+
+
+def test_token_cache_eviction(token_cache, monkeypatch):
+    monkeypatch.setattr(security, "AUTH_CACHE_SIZE", 2)
+    tokens = [_token(str(i)) for i in range(3)]
+    for token in tokens:
+        token_cache.decode_token(token)
+    stats = token_cache.get_auth_cache_stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    # El menos usado (el primero) fue el desalojado
+    token_cache.decode_token(tokens[0])
+    assert token_cache.auth_cache_stats["misses"] == 4
+
+
+def test_token_cache_checks_permissions(token_cache):
+    inactive = _token("inactivo", active=False)
+    user = _token("usuario")
+    token_cache.decode_token(inactive)
+    token_cache.decode_token(user)
+
+    with pytest.raises(HTTPException) as exc:
+        token_cache.authenticate(inactive)
+    assert exc.value.detail == "Inactive user"
+    with pytest.raises(HTTPException) as exc:
+        token_cache.authenticate(user, require_admin=True)
+    assert exc.value.detail == "Inactive user or not admin"
+    assert token_cache.authenticate(user)["id"] == "usuario"
+    assert token_cache.auth_cache_stats["hits"] == 3
+
+
+def test_parse_fields():
+    assert parse_fields(None, Pay) is None
+    assert parse_fields(" cost , ,date", Pay) == {"cost": 1, "date": 1}
+    # "id" es _id, que MongoDB devuelve siempre
+    assert parse_fields("id,cost", Pay) == {"cost": 1}
+    assert parse_fields("id", Pay) == {"_id": 1}
+    with pytest.raises(HTTPException) as exc:
+        parse_fields("cost,password", Pay)
+    assert exc.value.status_code == 400
+
+
+def test_redact_hides_values():
+    command = {"filter": {"email": "ana@example.com", "_id": {"$in": [1, 2, 3]}}, "sort": {"date": -1}}
+    assert redact(command) == {"filter": {"email": "?", "_id": {"$in": ["?"]}}, "sort": {"date": -1}}
+
+
+def test_redact_keeps_pipeline_structure():
+    pipeline = [
+        {"$match": {"cost": {"$gt": 500}}},
+        {"$lookup": {"from": "pays", "localField": "_id", "foreignField": "id_Contract", "as": "pays"}},
+        {"$project": {"cost": 1, "total": "$cost"}},
+        {"$limit": 10},
+    ]
+    assert redact(pipeline) == [
+        {"$match": {"cost": {"$gt": "?"}}},
+        {"$lookup": {"from": "pays", "localField": "_id", "foreignField": "id_Contract", "as": "pays"}},
+        {"$project": {"cost": 1, "total": "$cost"}},
+        {"$limit": 10},
+    ]
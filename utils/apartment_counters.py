@@ -0,0 +1,152 @@
+"""
+Contadores desnormalizados de cada apartamento.
+
+Cada apartamento guarda number_of_contracts, active_contracts y
+pending_maintenances. Las escrituras de contratos y mantenimientos los
+ajustan con $inc; para recalcularlos desde cero:
+
+    python -m utils.apartment_counters reconcile
+"""
+import asyncio
+import sys
+
+from pymongo import UpdateOne
+
+from utils.mongodb import get_collection, aggregate
+from utils.etag import versions
+from utils.invalidation import bus
+
+COUNTER_FIELDS = ("number_of_contracts", "active_contracts", "pending_maintenances")
+
+apartments_coll = get_collection("apartments")
+
+
+def contract_is_active(doc: dict) -> bool:
+    return doc.get("active", True) is not False and doc.get("status") != "inactive"
+
+
+def maintenance_is_pending(doc: dict) -> bool:
+    return doc.get("status") == "pending" and doc.get("active", True) is not False
+
+
+def maintenance_apartment(doc: dict):
+    """Apartamento de un mantenimiento (id_Apartment o el campo heredado apartment_id)"""
+    return doc.get("id_Apartment") or doc.get("apartment_id")
+
+
+def _contract_counts(doc: dict | None) -> dict:
+    if not doc:
+        return {}
+    return {"number_of_contracts": 1, "active_contracts": 1 if contract_is_active(doc) else 0}
+
+
+def _maintenance_counts(doc: dict | None) -> dict:
+    if not doc:
+        return {}
+    return {"pending_maintenances": 1 if maintenance_is_pending(doc) else 0}
+
+
+async def _apply(apartment_id, inc: dict):
+    inc = {field: value for field, value in inc.items() if value}
+    if apartment_id and inc:
+        await apartments_coll.update_one({"_id": apartment_id}, {"$inc": inc})
+        versions.bump("apartments")
+
+
+async def _move(old_apartment, old_counts: dict, new_apartment, new_counts: dict):
+    if old_apartment == new_apartment:
+        fields = set(old_counts) | set(new_counts)
+        await _apply(new_apartment, {f: new_counts.get(f, 0) - old_counts.get(f, 0) for f in fields})
+    else:
+        await _apply(old_apartment, {f: -value for f, value in old_counts.items()})
+        await _apply(new_apartment, new_counts)
+
+
+async def contract_changed(old: dict | None, new: dict | None):
+    """Ajusta los contadores tras crear (old=None), modificar o borrar (new=None) un contrato"""
+    versions.bump("contracts")
+    await _move(
+        old.get("id_apartment") if old else None, _contract_counts(old),
+        new.get("id_apartment") if new else None, _contract_counts(new)
+    )
+
+
+async def maintenance_changed(old: dict | None, new: dict | None):
+    """Ajusta los contadores tras crear (old=None) o modificar un mantenimiento"""
+    versions.bump("maintenance")
+    await _move(
+        maintenance_apartment(old) if old else None, _maintenance_counts(old),
+        maintenance_apartment(new) if new else None, _maintenance_counts(new)
+    )
+
+
+async def maintenances_created(docs: list[dict]):
+    """Suma los mantenimientos pendientes creados por lotes con una sola escritura"""
+    versions.bump("maintenance")
+    pending = {}
+    for doc in docs:
+        apartment_id = maintenance_apartment(doc)
+        if apartment_id and maintenance_is_pending(doc):
+            pending[apartment_id] = pending.get(apartment_id, 0) + 1
+    ops = [
+        UpdateOne({"_id": apartment_id}, {"$inc": {"pending_maintenances": count}})
+        for apartment_id, count in pending.items()
+    ]
+    if ops:
+        await apartments_coll.bulk_write(ops, ordered=False)
+        versions.bump("apartments")
+
+
+def reconcile_pipeline() -> list:
+    """Pipeline sobre apartments que recalcula los contadores y los escribe con $merge"""
+    contract_active = {"$and": [
+        {"$ne": ["$active", False]},
+        {"$ne": ["$status", "inactive"]}
+    ]}
+    return [
+        {"$project": {"_id": 1}},
+        {"$lookup": {
+            "from": "contracts",
+            "localField": "_id",
+            "foreignField": "id_apartment",
+            "pipeline": [{"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "active": {"$sum": {"$cond": [contract_active, 1, 0]}}
+            }}],
+            "as": "contracts"
+        }},
+        {"$lookup": {
+            "from": "maintenance",
+            "let": {"aid": "$_id"},
+            "pipeline": [
+                {"$match": {"status": "pending", "active": {"$ne": False}}},
+                {"$match": {"$expr": {"$or": [
+                    {"$eq": ["$id_Apartment", "$$aid"]},
+                    {"$eq": ["$apartment_id", "$$aid"]}
+                ]}}},
+                {"$count": "count"}
+            ],
+            "as": "pending"
+        }},
+        {"$project": {
+            "number_of_contracts": {"$ifNull": [{"$arrayElemAt": ["$contracts.total", 0]}, 0]},
+            "active_contracts": {"$ifNull": [{"$arrayElemAt": ["$contracts.active", 0]}, 0]},
+            "pending_maintenances": {"$ifNull": [{"$arrayElemAt": ["$pending.count", 0]}, 0]}
+        }},
+        {"$merge": {"into": "apartments", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ]
+
+
+async def reconcile_counters():
+    """Recalcula los contadores de todos los apartamentos"""
+    await aggregate(apartments_coll, reconcile_pipeline())
+    # Se espera la publicación: desde la línea de comandos no hay listener ni bucle que la complete
+    await bus.publish("apartments")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["reconcile"]:
+        print("Uso: python -m utils.apartment_counters reconcile")
+        sys.exit(2)
+    asyncio.run(reconcile_counters())
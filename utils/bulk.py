@@ -0,0 +1,31 @@
+"""
+Inserciones por lotes con resultado por elemento.
+
+insert_unordered usa insert_many(ordered=False): un documento rechazado por
+MongoDB (p. ej. clave duplicada) no impide que se escriban los demás.
+"""
+from pymongo.errors import BulkWriteError
+
+from models.bulk import BulkItemResult, BulkResult
+
+MAX_BULK_ITEMS = 1000
+
+
+async def insert_unordered(coll, docs: list[dict]) -> dict[int, str]:
+    """Inserta docs sin orden y devuelve {posición: error} de los rechazados.
+    Los documentos insertados quedan con su _id asignado."""
+    if not docs:
+        return {}
+    try:
+        await coll.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        return {err["index"]: err.get("errmsg", "Error de escritura") for err in e.details.get("writeErrors", [])}
+    return {}
+
+
+def summarize(results: list[BulkItemResult]) -> BulkResult:
+    """Ordena los resultados por posición y cuenta creados, omitidos y rechazados"""
+    results = sorted(results, key=lambda r: r.index)
+    created = sum(1 for r in results if r.status == "created")
+    skipped = sum(1 for r in results if r.status == "skipped")
+    return BulkResult(created=created, skipped=skipped, failed=len(results) - created - skipped, results=results)
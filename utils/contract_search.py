@@ -0,0 +1,100 @@
+"""
+Índice de búsqueda de contratos por prefijo.
+
+Cada contrato guarda en search_keys sus términos normalizados (número del
+apartamento e identificadores del inquilino, sin espacios y en minúsculas).
+La búsqueda usa un $regex anclado (^término) sobre el índice search_keys, que
+MongoDB resuelve como un rango del índice sin recorrer la colección.
+Para recalcular las claves de todos los contratos:
+
+    python -m utils.contract_search rebuild
+"""
+import asyncio
+import re
+import sys
+
+from utils.mongodb import get_collection, aggregate
+
+USER_FIELDS = ("id_user", "id_User")
+# Un prefijo corto coincide con casi todos los contratos y la paginación por _id
+# tendría que recorrer gran parte del índice search_keys para llenar cada página
+MIN_SEARCH_LENGTH = 3
+
+contracts_coll = get_collection("contracts")
+apartments_coll = get_collection("apartments")
+
+
+def normalize_term(term) -> str:
+    return str(term).strip().lower()
+
+
+def prefix_filter(term: str) -> dict:
+    """Filtro de búsqueda por prefijo que aprovecha el índice search_keys"""
+    return {"search_keys": {"$regex": "^" + re.escape(normalize_term(term))}}
+
+
+def build_search_keys(contract: dict, apartment_number: str | None) -> list[str]:
+    keys = {normalize_term(contract[field]) for field in USER_FIELDS if contract.get(field)}
+    if apartment_number:
+        keys.add(normalize_term(apartment_number))
+    return sorted(keys)
+
+
+async def search_keys_for(contract: dict) -> list[str]:
+    """Claves de búsqueda de un contrato (consulta el número de su apartamento)"""
+    apartment = None
+    if contract.get("id_apartment"):
+        apartment = await apartments_coll.find_one({"_id": contract["id_apartment"]}, {"number": 1})
+    return build_search_keys(contract, apartment.get("number") if apartment else None)
+
+
+async def apartment_renamed(apartment_id, old_number: str | None, new_number: str):
+    """Sustituye el número antiguo por el nuevo en las claves de los contratos del apartamento"""
+    old_key, new_key = normalize_term(old_number or ""), normalize_term(new_number)
+    if old_key == new_key:
+        return
+    await contracts_coll.update_many({"id_apartment": apartment_id}, [{"$set": {"search_keys": {
+        "$setUnion": [
+            {"$filter": {"input": {"$ifNull": ["$search_keys", []]}, "cond": {"$ne": ["$$this", old_key]}}},
+            [new_key]
+        ]
+    }}}])
+
+
+def _key_expr(field: str) -> dict:
+    return {"$cond": [
+        {"$ifNull": [field, False]},
+        {"$toLower": {"$trim": {"input": {"$toString": field}}}},
+        None
+    ]}
+
+
+def rebuild_pipeline() -> list:
+    """Pipeline sobre contracts que recalcula search_keys y lo escribe con $merge"""
+    terms = [_key_expr("$apartment.number")] + [_key_expr(f"${field}") for field in USER_FIELDS]
+    return [
+        {"$lookup": {
+            "from": "apartments",
+            "localField": "id_apartment",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"number": 1}}],
+            "as": "apartment"
+        }},
+        {"$unwind": {"path": "$apartment", "preserveNullAndEmptyArrays": True}},
+        {"$project": {"search_keys": {"$setUnion": [
+            {"$filter": {"input": terms, "cond": {"$ne": ["$$this", None]}}}
+        ]}}},
+        {"$merge": {"into": "contracts", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ]
+
+
+async def rebuild_search_keys():
+    """Recalcula search_keys en todos los contratos"""
+    await aggregate(contracts_coll, rebuild_pipeline())
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Uso: python -m utils.contract_search rebuild")
+        sys.exit(2)
+    asyncio.run(rebuild_search_keys())
@@ -0,0 +1,133 @@
+"""
+Comandos de MongoDB atribuidos a cada petición HTTP.
+
+DBStatsMiddleware abre un contexto (contextvars) por petición y
+CommandStatsListener, registrado en el cliente de utils/mongodb.py, suma en él
+cada comando: cantidad, tiempo total en la base y nombres. Al terminar se
+registran como campos del log y, con DB_STATS_HEADERS=true (desarrollo y
+pruebas), como cabeceras (X-DB-Commands, X-DB-Time-Ms, X-DB-Command-Names),
+lo que deja a la vista los patrones N+1.
+
+En las pruebas, assert_max_commands(response, n) falla si una respuesta
+necesitó más de n comandos; track_commands() mide código llamado directamente.
+"""
+import logging
+import os
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from pymongo.monitoring import CommandListener
+
+logger = logging.getLogger(__name__)
+
+COMMANDS_HEADER = "X-DB-Commands"
+TIME_HEADER = "X-DB-Time-Ms"
+NAMES_HEADER = "X-DB-Command-Names"
+
+# Desactivadas por defecto: revelan detalles internos de las consultas a los clientes
+EMIT_HEADERS = os.getenv("DB_STATS_HEADERS", "false").lower() == "true"
+
+
+class RequestDBStats:
+    """Comandos ejecutados dentro de un mismo contexto"""
+
+    __slots__ = ("commands", "time_ms", "names", "scope")
+
+    def __init__(self, scope: dict | None = None):
+        self.commands = 0
+        self.time_ms = 0.0
+        self.names = Counter()
+        self.scope = scope
+
+    def route(self) -> str | None:
+        """Método y plantilla de ruta de la petición (o su path si aún no se resolvió)"""
+        if not self.scope:
+            return None
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {getattr(route, 'path', None) or self.scope['path']}"
+
+    def summary(self) -> str:
+        return ",".join(f"{name}:{count}" for name, count in self.names.most_common())
+
+    def headers(self) -> list[tuple[bytes, bytes]]:
+        return [
+            (COMMANDS_HEADER.lower().encode(), str(self.commands).encode()),
+            (TIME_HEADER.lower().encode(), f"{self.time_ms:.2f}".encode()),
+            (NAMES_HEADER.lower().encode(), self.summary().encode()),
+        ]
+
+
+_current: ContextVar[RequestDBStats | None] = ContextVar("db_stats", default=None)
+
+
+def current_stats() -> RequestDBStats | None:
+    return _current.get()
+
+
+class CommandStatsListener(CommandListener):
+    """Suma los comandos al contexto activo; los de hilos de monitoreo no tienen contexto"""
+
+    def started(self, event):
+        stats = _current.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.names[event.command_name] += 1
+
+    def _finished(self, event):
+        stats = _current.get()
+        if stats is not None:
+            stats.time_ms += event.duration_micros / 1000
+
+    succeeded = _finished
+    failed = _finished
+
+
+command_stats = CommandStatsListener()
+
+
+@contextmanager
+def track_commands(scope: dict | None = None):
+    """Mide los comandos ejecutados dentro del bloque (en la misma tarea o hilo)"""
+    stats = RequestDBStats(scope)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def assert_max_commands(response, limit: int):
+    """Falla si la respuesta necesitó más de limit comandos de MongoDB"""
+    commands = int(response.headers[COMMANDS_HEADER])
+    assert commands <= limit, (
+        f"{commands} comandos de MongoDB (máximo {limit}): {response.headers.get(NAMES_HEADER)}"
+    )
+
+
+class DBStatsMiddleware:
+    """Abre el contexto de cada petición y publica los comandos en cabeceras y log"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_commands(scope) as stats:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and EMIT_HEADERS:
+                    message = {**message, "headers": [*message.get("headers", []), *stats.headers()]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if stats.commands:
+                    logger.info(
+                        f"{scope['method']} {scope['path']}: {stats.commands} comandos, {stats.time_ms:.2f} ms en MongoDB",
+                        extra={"db_commands": stats.commands, "db_time_ms": round(stats.time_ms, 2),
+                               "db_command_names": stats.summary()}
+                    )
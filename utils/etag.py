@@ -0,0 +1,66 @@
+"""
+ETags por versión de colección para las lecturas de catálogo.
+
+Cada escritura en una colección incrementa su versión; el ETag de una lectura
+se deriva de esa versión (y de la ruta y parámetros), así que una petición con
+If-None-Match se responde con 304 sin consultar MongoDB.
+La versión es la del contador compartido de la colección cache_versions (ver
+utils/invalidation.py), de modo que todos los workers y los reinicios generan
+el mismo ETag para el mismo estado.
+"""
+import hashlib
+
+from fastapi import Request, Response
+
+# Colecciones cuyas lecturas llevan ETag (routes/Apartment.py, routes/maintenance_type.py)
+ETAG_COLLECTIONS = ("apartments", "maintenance_types")
+
+
+class CollectionVersions:
+    """Copia local de las versiones compartidas de cada colección"""
+
+    def __init__(self):
+        self._versions = {}
+        self._listeners = []
+
+    def get(self, collection: str) -> int:
+        return self._versions.get(collection, 0)
+
+    def bump(self, *collections: str):
+        """Incrementa la versión local y avisa a los listeners, que la publican"""
+        for collection in collections:
+            self._versions[collection] = self.get(collection) + 1
+            for listener in self._listeners:
+                listener(collection)
+
+    def set(self, collection: str, version: int):
+        """Adopta la versión compartida; nunca retrocede"""
+        if version > self.get(collection):
+            self._versions[collection] = version
+
+    def add_listener(self, listener):
+        """Registra una función que recibe cada colección modificada localmente"""
+        self._listeners.append(listener)
+
+
+versions = CollectionVersions()
+
+
+def etag_for(request: Request, *collections: str) -> str:
+    """ETag fuerte de la respuesta según la ruta, los parámetros y las versiones"""
+    state = [request.url.path, str(request.query_params)]
+    state += [f"{name}:{versions.get(name)}" for name in collections]
+    return '"' + hashlib.sha1("|".join(state).encode()).hexdigest() + '"'
+
+
+def matches(request: Request, etag: str) -> bool:
+    """Indica si If-None-Match contiene el ETag actual"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,61 @@
+"""
+Ruta rápida de lectura: documentos de MongoDB a JSON sin modelos de Pydantic.
+
+Los listados convierten cada documento con to_api (solo los campos del modelo,
+_id -> id) y lo serializan directamente con orjson mediante FastJSONResponse,
+evitando construir el modelo y la segunda validación contra response_model.
+"""
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+
+def bson_default(value):
+    """Serializa los tipos BSON que el codificador JSON no conoce"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=bson_default)
+    return json.dumps(content, default=bson_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que serializa con orjson y entiende ObjectId"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def to_api(doc: dict, model: type[BaseModel], date_fields: tuple = (), fill_defaults: bool = True) -> dict:
+    """
+    Convierte un documento de MongoDB a la forma JSON del modelo (sin validarlo).
+    Con una proyección (?fields=) se pasa fill_defaults=False: los campos no pedidos
+    se omiten en lugar de inventar su valor por defecto.
+    """
+    out = {"id": str(doc["_id"]) if "_id" in doc else doc.get("id")}
+    for name, field in model.model_fields.items():
+        if name == "id" or (name not in doc and not fill_defaults):
+            continue
+        # Igual que al validar el modelo: los campos ausentes toman su valor por defecto
+        value = doc[name] if name in doc else field.get_default(call_default_factory=True)
+        if value is PydanticUndefined:
+            continue
+        if name in date_fields and isinstance(value, datetime):
+            value = value.date()
+        out[name] = value
+    return out
@@ -0,0 +1,63 @@
+"""
+Cliente HTTP asíncrono compartido para servicios externos (Firebase).
+
+Un solo httpx.AsyncClient por proceso mantiene las conexiones TLS abiertas
+(keep-alive), con timeouts, un máximo de peticiones simultáneas y reintentos
+con backoff exponencial ante errores de red, 429 y 5xx.
+"""
+import asyncio
+import logging
+import os
+import random
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_CLIENT_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", "5"))
+HTTP_RETRIES = int(os.getenv("HTTP_CLIENT_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_CLIENT_BACKOFF", "0.2"))
+HTTP_MAX_CONCURRENCY = int(os.getenv("HTTP_CLIENT_MAX_CONCURRENCY", "20"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_client: httpx.AsyncClient | None = None
+_semaphore: asyncio.Semaphore | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Cliente compartido (se crea en el primer uso)"""
+    global _client, _semaphore
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONCURRENCY, max_keepalive_connections=HTTP_MAX_CONCURRENCY),
+        )
+        _semaphore = asyncio.Semaphore(HTTP_MAX_CONCURRENCY)
+    return _client
+
+
+async def close_http_client():
+    global _client, _semaphore
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _semaphore = None
+
+
+async def post_json(url: str, payload: dict, retries: int = HTTP_RETRIES) -> httpx.Response:
+    """POST con JSON; reintenta errores de red, 429 y 5xx con backoff exponencial y jitter"""
+    client = get_http_client()
+    for attempt in range(retries + 1):
+        try:
+            async with _semaphore:
+                response = await client.post(url, json=payload)
+            if response.status_code not in RETRY_STATUS or attempt == retries:
+                return response
+            logger.warning(f"POST {url.split('?')[0]} respondió {response.status_code}, reintentando")
+        except httpx.TransportError as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"POST {url.split('?')[0]} falló ({e!r}), reintentando")
+        await asyncio.sleep(HTTP_BACKOFF * 2 ** attempt * (1 + random.random()))
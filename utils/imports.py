@@ -0,0 +1,75 @@
+"""
+Lectura en streaming de archivos de importación (CSV o NDJSON).
+
+El cuerpo de la petición se consume por fragmentos con request.stream(), se
+divide en líneas y se agrupa en bloques de registros para escribirlos por
+lotes sin cargar el archivo completo en memoria.
+"""
+import csv
+import json
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+
+IMPORT_CHUNK_SIZE = 500
+
+
+def detect_format(content_type: str | None, fmt: str | None = None) -> str:
+    """Formato del archivo: el parámetro explícito o, si no, el Content-Type"""
+    if not fmt:
+        content_type = (content_type or "").lower()
+        fmt = "ndjson" if "json" in content_type else "csv"
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Formato no soportado, use csv o ndjson")
+    return fmt
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Convierte un flujo de bytes en líneas de texto no vacías"""
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            text = line.decode("utf-8-sig").strip()
+            if text:
+                yield text
+    text = buffer.decode("utf-8-sig").strip()
+    if text:
+        yield text
+
+
+async def iter_records(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[dict | str]:
+    """Registros del archivo; las líneas ilegibles se devuelven como str con el error"""
+    header = None
+    async for line in iter_lines(stream):
+        if fmt == "ndjson":
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield f"JSON inválido: {e.msg}"
+                continue
+            yield record if isinstance(record, dict) else "Se esperaba un objeto JSON"
+        elif header is None:
+            header = [name.strip() for name in next(csv.reader([line]))]
+        else:
+            values = next(csv.reader([line]))
+            if len(values) != len(header):
+                yield f"Se esperaban {len(header)} columnas"
+                continue
+            yield {name: value.strip() for name, value in zip(header, values)}
+
+
+async def iter_chunks(records: AsyncIterator, size: int = IMPORT_CHUNK_SIZE) -> AsyncIterator[list]:
+    """Agrupa los registros en bloques de tamaño fijo (enumerados desde 0)"""
+    chunk = []
+    index = 0
+    async for record in records:
+        chunk.append((index, record))
+        index += 1
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
@@ -0,0 +1,142 @@
+"""
+Registro declarativo de índices de MongoDB.
+
+Cada colección declara sus índices en INDEXES y las formas de consulta que
+deben resolverse con índice en QUERY_SHAPES (las mismas que usan controllers/
+y pipelines/). Uso desde la línea de comandos:
+
+    python -m utils.indexes sync    # crea los índices que falten (idempotente)
+    python -m utils.indexes drift   # compara índices declarados vs existentes
+    python -m utils.indexes check   # falla si alguna consulta registrada hace COLLSCAN
+"""
+import asyncio
+import sys
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from utils.mongodb import get_collection
+
+INDEXES: dict[str, list[IndexModel]] = {
+    "pays": [
+        IndexModel([("id_Contract", ASCENDING), ("_id", ASCENDING)], name="id_Contract__id"),
+        IndexModel([("id_Contract", ASCENDING), ("date", DESCENDING)], name="id_Contract_date"),
+    ],
+    "contracts": [
+        IndexModel([("id_User", ASCENDING)], name="id_User"),
+        IndexModel([("id_user", ASCENDING)], name="id_user"),
+        IndexModel([("id_apartment", ASCENDING)], name="id_apartment"),
+        IndexModel([("search_keys", ASCENDING), ("_id", ASCENDING)], name="search_keys__id"),
+    ],
+    "maintenance": [
+        IndexModel([("id_Contract", ASCENDING), ("_id", ASCENDING)], name="id_Contract__id"),
+        IndexModel([("apartment_id", ASCENDING), ("status", ASCENDING)], name="apartment_id_status"),
+        IndexModel([("id_Apartment", ASCENDING), ("status", ASCENDING)], name="id_Apartment_status"),
+    ],
+    "apartments": [
+        IndexModel([("number", ASCENDING)], name="number"),
+    ],
+    "maintenance_types": [
+        IndexModel([("active", ASCENDING)], name="active"),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email"),
+    ],
+}
+
+# (colección, filtro) de las consultas calientes; los valores son de ejemplo
+QUERY_SHAPES: list[tuple[str, dict]] = [
+    ("pays", {"id_Contract": ObjectId()}),
+    ("contracts", {"id_User": ObjectId()}),
+    ("contracts", {"id_user": ObjectId()}),
+    ("contracts", {"id_apartment": ObjectId()}),
+    ("contracts", {"search_keys": {"$regex": "^a10"}}),
+    ("maintenance", {"id_Contract": {"$in": [ObjectId()]}}),
+    ("maintenance", {"apartment_id": ObjectId(), "status": "pending"}),
+    ("apartments", {"number": "a101"}),
+    ("maintenance_types", {"active": True}),
+    ("users", {"email": "usuario@example.com"}),
+]
+
+
+def _key_of(spec) -> list:
+    """Normaliza la especificación de claves de un índice a una lista comparable"""
+    return [
+        [field, int(direction) if isinstance(direction, (int, float)) else direction]
+        for field, direction in spec.items()
+    ]
+
+
+async def sync_indexes(db=None) -> dict:
+    """Crea los índices declarados que falten (en db o en la base de la aplicación). Es idempotente."""
+    created = {}
+    for name, models in INDEXES.items():
+        coll = db[name] if db is not None else get_collection(name)
+        created[name] = await coll.create_indexes(models)
+    return created
+
+
+async def index_drift() -> dict:
+    """Compara los índices declarados con los existentes en cada colección"""
+    report = {}
+    for name, models in INDEXES.items():
+        declared = {m.document["name"]: _key_of(m.document["key"]) for m in models}
+        actual = {}
+        async for info in await get_collection(name).list_indexes():
+            if info["name"] != "_id_":
+                actual[info["name"]] = _key_of(info["key"])
+
+        missing = [n for n in declared if n not in actual]
+        extra = [n for n in actual if n not in declared]
+        changed = [n for n in declared if n in actual and declared[n] != actual[n]]
+        if missing or extra or changed:
+            report[name] = {"missing": missing, "extra": extra, "changed": changed}
+    return report
+
+
+def _plan_stages(plan) -> list:
+    """Recorre un plan de explain y devuelve todas sus etapas"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def check_query_shapes() -> list:
+    """Devuelve las consultas registradas cuyo plan ganador incluye COLLSCAN"""
+    failures = []
+    for name, query in QUERY_SHAPES:
+        explain = await get_collection(name).find(query).explain()
+        winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(winning):
+            failures.append({"collection": name, "filter": str(query)})
+    return failures
+
+
+async def _main(command: str) -> int:
+    if command == "sync":
+        for name, created in (await sync_indexes()).items():
+            print(f"{name}: {', '.join(created)}")
+        return 0
+    if command == "drift":
+        report = await index_drift()
+        for name, diff in report.items():
+            print(f"{name}: {diff}")
+        return 1 if report else 0
+    if command == "check":
+        failures = await check_query_shapes()
+        for failure in failures:
+            print(f"COLLSCAN en {failure['collection']}: {failure['filter']}")
+        return 1 if failures else 0
+    print("Uso: python -m utils.indexes [sync|drift|check]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else "")))
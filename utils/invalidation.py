@@ -0,0 +1,202 @@
+"""
+Bus de invalidación de cachés entre procesos (workers de uvicorn).
+
+Un cambio escrito por cualquier worker llega a los demás por uno de dos caminos:
+
+- Replica set o cluster: un change stream sobre la base de datos filtrado a
+  cache_versions y a las colecciones con callbacks registrados. Se guarda el resume token de cada evento para reanudar
+  tras un corte sin perder cambios.
+- Servidor standalone (sin change streams): cada worker consulta la colección
+  cache_versions cada CACHE_POLL_INTERVAL segundos.
+
+Las escrituras locales incrementan el contador de la colección en
+cache_versions solo si alguien lo lee: las colecciones con ETag (el contador es
+su versión, ver utils/etag.py) y, en modo polling, las que tienen callbacks.
+Las versiones se cargan al arrancar (load_versions) y se mantienen al día desde
+el bus.
+
+Las cachés se registran con bus.register(coleccion, callback). Para probarlo con
+un replica set local de un nodo (sin TLS: lo decide la URI, ver utils/mongodb.py):
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --fork --logpath /tmp/rs0.log
+    mongosh --quiet --eval "rs.initiate()"
+    MONGODB_URI="mongodb://localhost:27017/?directConnection=true" python -m utils.invalidation watch
+"""
+import asyncio
+import logging
+import os
+import sys
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure, PyMongoError
+
+from utils.etag import versions, ETAG_COLLECTIONS
+from utils.mongodb import get_database
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ("apartments", "contracts", "pays", "maintenance", "maintenance_types")
+VERSIONS_COLLECTION = "cache_versions"
+POLL_INTERVAL = float(os.getenv("CACHE_POLL_INTERVAL", "2"))
+RETRY_DELAY = 5
+
+# Código de error de MongoDB cuando el resume token ya no está en el oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+class InvalidationBus:
+    """Reparte las notificaciones de cambios a las cachés registradas"""
+
+    def __init__(self):
+        self._callbacks = {name: [] for name in WATCHED_COLLECTIONS}
+        self.resume_token = None
+        self.mode = None
+        self._seen = {}
+        self._task = None
+        self._pending = set()
+
+    def register(self, collection: str, callback):
+        """callback(coleccion) se llama cuando otro worker (o este) modifica la colección"""
+        self._callbacks[collection].append(callback)
+
+    def notify(self, collection: str):
+        for callback in self._callbacks.get(collection, []):
+            try:
+                callback(collection)
+            except Exception as e:
+                logger.error(f"Error invalidando caché de {collection}: {e}")
+
+    def notify_all(self):
+        for collection in WATCHED_COLLECTIONS:
+            self.notify(collection)
+
+    async def _is_replica_set(self, db) -> bool:
+        hello = await db.client.admin.command("hello")
+        return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+    async def load_versions(self):
+        """Carga las versiones compartidas de cache_versions en utils.etag.versions"""
+        coll = get_database()[VERSIONS_COLLECTION]
+        for doc in await coll.find({"_id": {"$in": list(WATCHED_COLLECTIONS)}}).to_list():
+            versions.set(doc["_id"], doc["version"])
+
+    def _has_consumer(self, collection: str) -> bool:
+        """Indica si alguien lee el contador compartido de la colección"""
+        return collection in ETAG_COLLECTIONS or (self.mode == "poll" and bool(self._callbacks.get(collection)))
+
+    async def _watch(self, db):
+        observed = [name for name, callbacks in self._callbacks.items() if callbacks]
+        pipeline = [{"$match": {"ns.coll": {"$in": [*observed, VERSIONS_COLLECTION]}}}]
+        try:
+            stream = await db.watch(pipeline, resume_after=self.resume_token)
+        except OperationFailure as e:
+            if e.code != CHANGE_STREAM_HISTORY_LOST:
+                raise
+            # Se perdieron eventos: se invalida todo y se empieza de nuevo
+            logger.warning("Resume token caducado, invalidando todas las cachés")
+            self.resume_token = None
+            self.notify_all()
+            stream = await db.watch(pipeline)
+
+        async with stream:
+            async for change in stream:
+                self.resume_token = stream.resume_token
+                collection = change.get("ns", {}).get("coll")
+                if collection == VERSIONS_COLLECTION:
+                    # Sin updateLookup: la versión viene en el propio evento ($inc o upsert)
+                    name = change.get("documentKey", {}).get("_id")
+                    version = (change.get("updateDescription", {}).get("updatedFields", {}).get("version")
+                               or (change.get("fullDocument") or {}).get("version"))
+                    if name in self._callbacks and version is not None:
+                        versions.set(name, version)
+                elif collection:
+                    self.notify(collection)
+
+    async def _poll(self, db):
+        coll = db[VERSIONS_COLLECTION]
+        while True:
+            docs = await coll.find({"_id": {"$in": list(WATCHED_COLLECTIONS)}}).to_list()
+            for doc in docs:
+                versions.set(doc["_id"], doc["version"])
+                previous = self._seen.get(doc["_id"])
+                self._seen[doc["_id"]] = doc["version"]
+                if previous is not None and previous != doc["version"]:
+                    self.notify(doc["_id"])
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _publish(self, collection: str):
+        """Anuncia una escritura local incrementando su contador en cache_versions"""
+        if not self._has_consumer(collection):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.publish(collection))
+        # Se guarda la referencia para que el recolector no cancele la escritura a medias
+        self._pending.add(task)
+        task.add_done_callback(self._published)
+
+    def _published(self, task: asyncio.Task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"No se pudo publicar el cambio en {VERSIONS_COLLECTION}: {task.exception()!r}")
+
+    async def publish(self, collection: str):
+        """Incrementa el contador compartido de la colección y adopta la nueva versión.
+        Para procesos sin bus (scripts), que deben esperar la escritura antes de salir."""
+        doc = await get_database()[VERSIONS_COLLECTION].find_one_and_update(
+            {"_id": collection}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        versions.set(doc["_id"], doc["version"])
+
+    async def run(self):
+        """Bucle principal: change stream si es posible, polling si no; reintenta ante errores"""
+        db = get_database()
+        while True:
+            try:
+                await self.load_versions()
+                self.mode = "watch" if await self._is_replica_set(db) else "poll"
+                logger.info(f"Bus de invalidación en modo {self.mode}")
+                if self.mode == "watch":
+                    await self._watch(db)
+                else:
+                    await self._poll(db)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.warning(f"Bus de invalidación interrumpido, reintentando: {e}")
+                # Puede haberse perdido algún cambio mientras no había conexión
+                if self.resume_token is None:
+                    self.notify_all()
+                await asyncio.sleep(RETRY_DELAY)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        # Las publicaciones pendientes se completan antes de cerrar el cliente
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+bus = InvalidationBus()
+versions.add_listener(bus._publish)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["watch"]:
+        print("Uso: python -m utils.invalidation watch")
+        sys.exit(2)
+    logging.basicConfig(level=logging.INFO)
+    for _collection in WATCHED_COLLECTIONS:
+        bus.register(_collection, lambda collection: print(f"cambio en {collection}"))
+    asyncio.run(bus.run())
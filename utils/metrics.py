@@ -0,0 +1,161 @@
+"""
+Métricas de la API en formato de texto de Prometheus.
+
+MetricsMiddleware es un middleware ASGI puro (sin BaseHTTPMiddleware) que por
+petición solo suma contadores en memoria: cantidad, latencia y tamaño de la
+respuesta por plantilla de ruta, método y clase de estado, más las peticiones
+en curso. render_metrics() agrega además el pool de MongoDB y las cachés.
+Las métricas son por proceso: con varios workers cada uno expone las suyas.
+
+/metrics solo responde si está definida METRICS_TOKEN, y exige el encabezado
+Authorization: Bearer <METRICS_TOKEN> (authorization.credentials en la
+configuración de scrape de Prometheus).
+"""
+import os
+import secrets
+import time
+from bisect import bisect_left
+
+from fastapi import HTTPException, Request
+
+from utils.mongodb import get_pool_stats
+from utils.security import get_auth_cache_stats
+from utils.etag import versions, ETAG_COLLECTIONS
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Rutas sin plantilla (404) se agrupan para no crear una serie por URL
+UNMATCHED_ROUTE = "unmatched"
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: str) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class RequestMetrics:
+    """Series por (método, ruta, clase de estado)"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.series = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, size: int):
+        key = (method, route, f"{status // 100}xx")
+        entry = self.series.get(key)
+        if entry is None:
+            entry = self.series[key] = [0, Histogram(LATENCY_BUCKETS), Histogram(SIZE_BUCKETS)]
+        entry[0] += 1
+        entry[1].observe(seconds)
+        entry[2].observe(size)
+
+
+metrics = RequestMetrics()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsMiddleware:
+    """Registra cada petición HTTP en metrics"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight -= 1
+            route = scope.get("route")
+            template = getattr(route, "path", None) or UNMATCHED_ROUTE
+            metrics.observe(scope["method"], template, status, time.perf_counter() - started, size)
+
+
+def _gauges(name: str, help_text: str, values: dict, label: str) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    lines += [f'{name}{{{label}="{key}"}} {value}' for key, value in values.items()]
+    return lines
+
+
+def check_metrics_token(request: Request):
+    """Dependencia de /metrics: sin METRICS_TOKEN la ruta no existe; con él, se exige"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+
+
+def render_metrics() -> str:
+    """Todas las métricas en formato de exposición de texto de Prometheus"""
+    lines = [
+        "# HELP http_requests_in_flight Peticiones HTTP en curso",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {metrics.in_flight}",
+        "# HELP http_requests_total Peticiones HTTP atendidas",
+        "# TYPE http_requests_total counter",
+    ]
+    series = sorted(metrics.series.items())
+    labels = {key: f'method="{key[0]}",route="{_escape(key[1])}",status="{key[2]}"' for key, _ in series}
+    lines += [f"http_requests_total{{{labels[key]}}} {entry[0]}" for key, entry in series]
+
+    lines += ["# HELP http_request_duration_seconds Latencia de las peticiones HTTP",
+              "# TYPE http_request_duration_seconds histogram"]
+    for key, entry in series:
+        lines += entry[1].lines("http_request_duration_seconds", labels[key])
+
+    lines += ["# HELP http_response_size_bytes Tamaño del cuerpo de las respuestas HTTP",
+              "# TYPE http_response_size_bytes histogram"]
+    for key, entry in series:
+        lines += entry[2].lines("http_response_size_bytes", labels[key])
+
+    lines += _gauges("mongodb_pool", "Estado del pool de conexiones de MongoDB", get_pool_stats(), "stat")
+    lines += _gauges("auth_token_cache", "Caché de tokens JWT verificados", get_auth_cache_stats(), "stat")
+    lines += _gauges("cache_collection_version", "Versión de caché (ETag) de cada colección",
+                     {name: versions.get(name) for name in ETAG_COLLECTIONS}, "collection")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,98 @@
+"""
+Migración por lotes de referencias guardadas como texto a ObjectId.
+
+Recorre cada colección de REFERENCE_FIELDS en orden de _id, reescribe los
+campos que aún sean texto y guarda un checkpoint en la colección "migrations"
+después de cada lote, de modo que puede interrumpirse y reanudarse.
+
+    python -m utils.migrate_references [--batch-size N] [--reset]
+"""
+import argparse
+import asyncio
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from utils.mongodb import get_collection
+from utils.references import REFERENCE_FIELDS, parse_object_id
+
+MIGRATION_ID = "references_to_objectid"
+
+checkpoints = get_collection("migrations")
+
+
+async def migrate_collection(name: str, fields: list[str], batch_size: int = 500) -> dict:
+    """Migra una colección lote a lote a partir de su último checkpoint"""
+    coll = get_collection(name)
+    checkpoint_id = f"{MIGRATION_ID}:{name}"
+    state = await checkpoints.find_one({"_id": checkpoint_id}) or {
+        "last_id": None, "converted": 0, "invalid": 0, "done": False
+    }
+    if state.get("done"):
+        return state
+
+    pending = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    while True:
+        query = pending if state["last_id"] is None else {"$and": [pending, {"_id": {"$gt": state["last_id"]}}]}
+        batch = await coll.find(query, {field: 1 for field in fields}).sort("_id", 1).limit(batch_size).to_list()
+        if not batch:
+            break
+
+        updates = []
+        for doc in batch:
+            changes = {}
+            for field in fields:
+                value = doc.get(field)
+                if not isinstance(value, str):
+                    continue
+                oid = parse_object_id(value)
+                if oid is None:
+                    state["invalid"] += 1
+                else:
+                    changes[field] = oid
+            if changes:
+                updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+
+        if updates:
+            result = await coll.bulk_write(updates, ordered=False)
+            state["converted"] += result.modified_count
+
+        state["last_id"] = batch[-1]["_id"]
+        await _save_checkpoint(checkpoint_id, state)
+        print(f"{name}: {state['converted']} convertidos, {state['invalid']} inválidos (último _id {state['last_id']})")
+
+    state["done"] = True
+    await _save_checkpoint(checkpoint_id, state)
+    return state
+
+
+async def _save_checkpoint(checkpoint_id: str, state: dict):
+    await checkpoints.update_one(
+        {"_id": checkpoint_id},
+        {"$set": {
+            "last_id": state["last_id"],
+            "converted": state["converted"],
+            "invalid": state["invalid"],
+            "done": state["done"],
+            "updated_at": datetime.utcnow(),
+        }},
+        upsert=True
+    )
+
+
+async def migrate_references(batch_size: int = 500, reset: bool = False) -> dict:
+    """Migra todas las colecciones con referencias"""
+    if reset:
+        await checkpoints.delete_many({"_id": {"$regex": f"^{MIGRATION_ID}:"}})
+    return {
+        name: await migrate_collection(name, fields, batch_size)
+        for name, fields in REFERENCE_FIELDS.items()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra referencias de texto a ObjectId")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--reset", action="store_true", help="Ignora los checkpoints guardados")
+    args = parser.parse_args()
+    asyncio.run(migrate_references(args.batch_size, args.reset))
@@ -1,8 +1,19 @@
+import asyncio
+import json
+import logging
 import os
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
+from pymongo.errors import CollectionInvalid
+from pymongo.monitoring import CommandListener, ConnectionPoolListener
 from pymongo.server_api import ServerApi
 
+from utils.db_stats import command_stats, current_stats
+
 load_dotenv()
 
 
@@ -10,48 +21,342 @@ load_dotenv()
 DB = os.getenv("DATABASE_NAME") or os.getenv("MONGO_DB_NAME")
 URI = os.getenv("MONGODB_URI") or os.getenv("URI")
 
-# Validate that we have the required environment variables
-if not DB:
-    raise ValueError("Database name not found. Set DATABASE_NAME or MONGO_DB_NAME environment variable")
-if not URI:
-    raise ValueError("MongoDB URI not found. Set MONGODB_URI or URI environment variable")
+
+
+def _env_int(name: str, default: int | None) -> int | None:
+    """Lee un entero de las variables de entorno (vacío = valor por defecto)"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+# Configuración del pool de conexiones (por worker)
+MAX_POOL_SIZE = _env_int("MONGO_MAX_POOL_SIZE", 100)
+MIN_POOL_SIZE = _env_int("MONGO_MIN_POOL_SIZE", 0)
+MAX_IDLE_TIME_MS = _env_int("MONGO_MAX_IDLE_TIME_MS", None)
+WAIT_QUEUE_TIMEOUT_MS = _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", None)
+CONNECT_TIMEOUT_MS = _env_int("MONGO_CONNECT_TIMEOUT_MS", 20000)
+SOCKET_TIMEOUT_MS = _env_int("MONGO_SOCKET_TIMEOUT_MS", None)
+SERVER_SELECTION_TIMEOUT_MS = _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)
+# Conexiones que el arranque abre por adelantado (warm_pool)
+WARM_CONNECTIONS = _env_int("MONGO_WARM_CONNECTIONS", MIN_POOL_SIZE)
+# Lista separada por comas, p. ej. "zstd,snappy,zlib". zstd y snappy requieren
+# los paquetes opcionales zstandard / python-snappy; pymongo ignora los que falten.
+COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "").strip()
+# TLS: por defecto lo decide la URI (mongodb+srv:// lo activa, mongodb://host
+# local no). MONGO_TLS=true/false lo fuerza; MONGO_TLS_ALLOW_INVALID_CERTIFICATES
+# solo para entornos con certificados autofirmados.
+TLS = os.getenv("MONGO_TLS", "").strip().lower()
+TLS_ALLOW_INVALID_CERTIFICATES = os.getenv("MONGO_TLS_ALLOW_INVALID_CERTIFICATES", "false").lower() == "true"
+
+
+# Registro de consultas lentas: umbral en ms (0 lo desactiva), destino
+# ("collection" = colección capped, "file" = archivo rotativo) y fracción de
+# consultas lentas a las que además se les captura el explain.
+SLOW_QUERY_MS = _env_int("MONGO_SLOW_QUERY_MS", 200)
+SLOW_QUERY_SINK = os.getenv("MONGO_SLOW_QUERY_SINK", "collection").strip().lower()
+SLOW_QUERY_COLLECTION = "slow_queries"
+SLOW_QUERY_CAP_BYTES = _env_int("MONGO_SLOW_QUERY_CAP_BYTES", 16 * 1024 * 1024)
+SLOW_QUERY_FILE = os.getenv("MONGO_SLOW_QUERY_FILE", "slow_queries.log")
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("MONGO_SLOW_QUERY_EXPLAIN_RATE", "0") or 0)
+
+# Partes del comando que describen la consulta; el resto (documentos insertados,
+# sesión, clusterTime...) no se guarda
+SHAPE_KEYS = ("filter", "projection", "sort", "pipeline", "query", "update", "updates", "deletes",
+              "limit", "skip", "key", "hint")
+# Claves cuyo valor es estructura (nombres de colecciones/campos), no datos
+STRUCTURAL_KEYS = {"from", "localField", "foreignField", "as", "into", "on", "coll", "key", "hint",
+                   "projection", "sort", "$project", "$sort", "$limit", "$skip", "$count", "$unwind"}
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Campos de protocolo que no se pueden reenviar dentro de explain
+PROTOCOL_KEYS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "apiVersion",
+                 "apiStrict", "apiDeprecationErrors", "readConcern", "writeConcern"}
+
+
+def redact(value, structural: bool = False):
+    """Forma de una consulta con los valores reemplazados por "?" (conserva campos y operadores)"""
+    if isinstance(value, dict):
+        return {key: redact(item, structural or key in STRUCTURAL_KEYS) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [redact(item, structural) for item in value]
+        # Listas de valores ($in, $nin...) se resumen en un solo elemento
+        return items if any(isinstance(item, (dict, list)) for item in items) else items[:1]
+    if structural or (isinstance(value, str) and value.startswith("$")):
+        return value
+    return "?"
+
+
+class SlowQueryListener(CommandListener):
+    """Registra los comandos que superan SLOW_QUERY_MS con su forma, duración y ruta de origen"""
+
+    def __init__(self, threshold_ms: int, sink: str, explain_rate: float):
+        self.threshold_micros = threshold_ms * 1000
+        self.sink = sink
+        self.explain_rate = explain_rate
+        self._pending = {}
+        self._tasks = set()
+        self._file_logger = None
+
+    def started(self, event):
+        if event.command_name == "explain" or event.command.get(event.command_name) == SLOW_QUERY_COLLECTION:
+            return
+        route = current_stats().route() if current_stats() else None
+        self._pending[(event.connection_id, event.request_id)] = (event.command, event.database_name, route)
+
+    def _finished(self, event, error=None):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None or event.duration_micros < self.threshold_micros:
+            return
+        command, database, route = pending
+        record = {
+            "at": datetime.now(timezone.utc),
+            "command": event.command_name,
+            "database": database,
+            "collection": command.get(event.command_name),
+            "shape": redact({key: command[key] for key in SHAPE_KEYS if key in command}),
+            "duration_ms": round(event.duration_micros / 1000, 2),
+            "route": route,
+            "error": error,
+        }
+        explain = event.command_name in EXPLAINABLE_COMMANDS and random.random() < self.explain_rate
+        self._write(record, command if explain else None, database)
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event, str(event.failure.get("errmsg", event.failure)))
+
+    def _write(self, record: dict, command: dict | None, database: str):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if command is not None and loop is not None:
+            self._track(loop.create_task(self._explain_and_write(record, command, database)))
+        elif self.sink == "file" or loop is None:
+            self._write_file(record)
+        else:
+            self._track(loop.create_task(self._insert(record)))
+
+    def _track(self, task: asyncio.Task):
+        # El loop solo guarda referencias débiles: sin esta el registro podría perderse a medias
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.getLogger(__name__).warning(f"Falló el registro de la consulta lenta: {task.exception()!r}")
+
+    async def _explain_and_write(self, record: dict, command: dict, database: str):
+        explained = {key: value for key, value in command.items() if key not in PROTOCOL_KEYS}
+        try:
+            result = await get_mongo_client()[database].command("explain", explained, verbosity="queryPlanner")
+            record["winning_plan"] = result.get("queryPlanner", {}).get("winningPlan") or result.get("stages")
+        except Exception as e:
+            record["explain_error"] = str(e)
+        if self.sink == "file":
+            self._write_file(record)
+        else:
+            await self._insert(record)
+
+    async def _insert(self, record: dict):
+        try:
+            await get_collection(SLOW_QUERY_COLLECTION).insert_one(record)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"No se pudo registrar la consulta lenta: {e}")
+
+    def _write_file(self, record: dict):
+        if self._file_logger is None:
+            self._file_logger = logging.getLogger(f"{__name__}.slow_queries")
+            self._file_logger.propagate = False
+            self._file_logger.addHandler(RotatingFileHandler(SLOW_QUERY_FILE, maxBytes=10 * 1024 * 1024, backupCount=5))
+            self._file_logger.setLevel(logging.INFO)
+        self._file_logger.info(json.dumps(record, default=str))
+
+
+slow_queries = SlowQueryListener(SLOW_QUERY_MS or 0, SLOW_QUERY_SINK, SLOW_QUERY_EXPLAIN_RATE)
+
+
+async def ensure_slow_query_collection():
+    """Crea la colección capped del registro de consultas lentas si no existe"""
+    if not SLOW_QUERY_MS or SLOW_QUERY_SINK != "collection":
+        return
+    try:
+        await get_mongo_client()[DB].create_collection(SLOW_QUERY_COLLECTION, capped=True, size=SLOW_QUERY_CAP_BYTES)
+    except CollectionInvalid:
+        pass
+
+
+class PoolStatsListener(ConnectionPoolListener):
+    """Lleva los contadores del pool de conexiones a partir de los eventos de pymongo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failed = 0
+        self.clears = 0
+
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add(clears=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(closed=1)
+
+    def connection_check_out_started(self, event):
+        self._add(waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(waiting=-1, checkout_failed=1)
+
+    def connection_checked_out(self, event):
+        self._add(waiting=-1, checked_out=1)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_pool_size": MAX_POOL_SIZE,
+                "min_pool_size": MIN_POOL_SIZE,
+                "checked_out": self.checked_out,
+                "waiting": self.waiting,
+                "open": self.created - self.closed,
+                "created": self.created,
+                "closed": self.closed,
+                "checkout_failed": self.checkout_failed,
+                "clears": self.clears,
+            }
+
+
+pool_stats = PoolStatsListener()
 
 _client = None
 
 
+def get_client_options() -> dict:
+    """Opciones del cliente construidas desde las variables de entorno"""
+    options = {
+        "server_api": ServerApi("1"),
+        "maxPoolSize": MAX_POOL_SIZE,
+        "minPoolSize": MIN_POOL_SIZE,
+        "connectTimeoutMS": CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": SERVER_SELECTION_TIMEOUT_MS,
+        "event_listeners": [pool_stats, command_stats] + ([slow_queries] if SLOW_QUERY_MS else []),
+    }
+    if MAX_IDLE_TIME_MS is not None:
+        options["maxIdleTimeMS"] = MAX_IDLE_TIME_MS
+    if WAIT_QUEUE_TIMEOUT_MS is not None:
+        options["waitQueueTimeoutMS"] = WAIT_QUEUE_TIMEOUT_MS
+    if SOCKET_TIMEOUT_MS is not None:
+        options["socketTimeoutMS"] = SOCKET_TIMEOUT_MS
+    if COMPRESSORS:
+        options["compressors"] = COMPRESSORS
+    if TLS in ("true", "false"):
+        options["tls"] = TLS == "true"
+    if TLS_ALLOW_INVALID_CERTIFICATES:
+        options["tlsAllowInvalidCertificates"] = True
+    return options
+
+
+def create_client(uri: str) -> AsyncMongoClient:
+    """Cliente independiente (p. ej. benchmarks) con las mismas opciones de conexión,
+    sin los listeners de la app para no mezclar sus comandos con los de las peticiones"""
+    return AsyncMongoClient(uri, **{**get_client_options(), "event_listeners": [pool_stats]})
+
+
 def get_mongo_client():
-    """Obtiene el cliente MongoDB (lazy loading)"""
+    """Obtiene el cliente MongoDB asíncrono (lazy loading)"""
     global _client
     if _client is None:
-        _client = MongoClient(
-            URI,
-            server_api=ServerApi("1"),
-            tls=True,
-            tlsAllowInvalidCertificates=True,
-            serverSelectionTimeoutMS=5000  # Timeout más corto
-        )
+        # Las variables se validan al crear el cliente, no al importar el módulo
+        if not DB:
+            raise ValueError("Database name not found. Set DATABASE_NAME or MONGO_DB_NAME environment variable")
+        if not URI:
+            raise ValueError("MongoDB URI not found. Set MONGODB_URI or URI environment variable")
+        _client = AsyncMongoClient(URI, **get_client_options())
     return _client
 
-def get_collection(col):
-    """Obtiene una colección de MongoDB"""
-    client = get_mongo_client()
-    return client[DB][col]
 
+class LazyCollection:
+    """Colección que se resuelve en el primer uso, para no crear el cliente al importar"""
 
-def t_connection():
-    """Función para probar la conexión (solo cuando sea necesario)"""
-    try:
-        client = get_mongo_client()
-        client.admin.command("ping")
-        return True
-    except Exception as e:
-        print(f"Error connecting to MongoDB: {e}")
-        return False
+    __slots__ = ("_name", "_collection")
+
+    def __init__(self, name: str):
+        self._name = name
+        self._collection = None
+
+    def _resolve(self):
+        if self._collection is None:
+            self._collection = get_mongo_client()[DB][self._name]
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
+
+
+async def warm_pool(connections: int = WARM_CONNECTIONS) -> int:
+    """Abre conexiones del pool por adelantado con pings concurrentes"""
+    client = get_mongo_client()
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(1, connections))))
+    return get_pool_stats()["open"]
 
 
+def get_pool_stats() -> dict:
+    """Devuelve los contadores actuales del pool de conexiones"""
+    return pool_stats.snapshot()
 
+def get_database():
+    """Obtiene la base de datos asíncrona de la aplicación"""
+    return get_mongo_client()[DB]
 
+def get_collection(col):
+    """Obtiene una colección asíncrona de MongoDB (el cliente se crea en el primer uso)"""
+    return LazyCollection(col)
 
 
+async def aggregate(coll, pipeline: list, **kwargs) -> list:
+    """Ejecuta un pipeline de agregación y devuelve los documentos como lista"""
+    cursor = await coll.aggregate(pipeline, **kwargs)
+    return await cursor.to_list()
 
 
+async def t_connection():
+    """Función para probar la conexión (solo cuando sea necesario)"""
+    try:
+        client = get_mongo_client()
+        await client.admin.command("ping")
+        return True
+    except Exception as e:
+        print(f"Error connecting to MongoDB: {e}")
+        return False
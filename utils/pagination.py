@@ -0,0 +1,110 @@
+"""
+Paginación por cursor (keyset) sobre _id.
+
+Las rutas de listado reciben Page como dependencia (limit, cursor, with_total).
+El cuerpo de la respuesta sigue siendo una lista; el cursor de la página
+siguiente y el total opcional viajan en las cabeceras X-Next-Cursor y X-Total-Count.
+"""
+import base64
+import binascii
+from typing import Annotated
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query, Response
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def encode_cursor(last_id) -> str:
+    """Convierte el último _id de una página en un cursor opaco"""
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    """Convierte un cursor opaco en el _id a partir del cual continuar"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return ObjectId(base64.urlsafe_b64decode(padded).decode())
+    # ValueError cubre binascii.Error, UnicodeDecodeError y la entrada no ASCII
+    except (ValueError, InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+class Page:
+    """Parámetros de paginación y cabeceras de la respuesta"""
+
+    def __init__(
+        self,
+        response: Response = None,
+        limit: Annotated[int, Query(ge=1, le=MAX_LIMIT, description="Cantidad máxima de elementos")] = DEFAULT_LIMIT,
+        cursor: Annotated[str | None, Query(description="Cursor devuelto en X-Next-Cursor")] = None,
+        with_total: Annotated[bool, Query(description="Calcula el total en X-Total-Count")] = False,
+    ):
+        self.response = response
+        self.limit = limit
+        self.after_id = decode_cursor(cursor) if cursor else None
+        self.with_total = with_total
+        self.next_cursor = None
+        self.total = None
+
+    def window(self) -> list:
+        """Etapas que seleccionan la página: posición del cursor, orden y límite"""
+        return [self._after(), {"$sort": {"_id": 1}}, self._limit()]
+
+    def _after(self) -> dict:
+        return {"$match": {"_id": {"$gt": self.after_id}} if self.after_id else {}}
+
+    def _limit(self) -> dict:
+        # Se pide un elemento extra para saber si existe una página siguiente
+        return {"$limit": self.limit + 1}
+
+    def pipeline(self, prefix: list, stages: list | None = None) -> list:
+        """
+        Pipeline paginado: prefix filtra la colección, stages se aplica solo a la página.
+        Con with_total el total se calcula en la misma consulta usando $facet.
+        """
+        if not self.with_total:
+            return prefix + self.window() + (stages or [])
+        # El orden va antes de $facet para que use el índice de _id; dentro de
+        # $facet no hay índices y la rama items ordenaría todo el conjunto en memoria
+        items = [self._after(), self._limit()] + (stages or [])
+        return prefix + [{"$sort": {"_id": 1}}, {"$facet": {"items": items, "total": [{"$count": "count"}]}}]
+
+    def unpack(self, rows: list) -> list:
+        """Extrae los documentos del resultado de pipeline() y completa la página"""
+        if not self.with_total:
+            return self.finish(rows)
+        facet = rows[0] if rows else {"items": [], "total": []}
+        return self.finish(facet["items"], count_of(facet["total"]))
+
+    def finish(self, docs: list, total: int | None = None) -> list:
+        """Recorta el elemento extra, calcula el siguiente cursor y fija las cabeceras"""
+        if len(docs) > self.limit:
+            docs = docs[:self.limit]
+            last = docs[-1]
+            self.next_cursor = encode_cursor(last["_id"] if "_id" in last else last["id"])
+        self.total = total
+
+        if self.response is not None:
+            self.response.headers.update(self.headers)
+        return docs
+
+    @property
+    def headers(self) -> dict:
+        """Cabeceras de la página, para respuestas construidas a mano"""
+        headers = {}
+        if self.next_cursor:
+            headers[NEXT_CURSOR_HEADER] = self.next_cursor
+        if self.total is not None:
+            headers[TOTAL_COUNT_HEADER] = str(self.total)
+        return headers
+
+
+def count_of(rows: list) -> int:
+    """Lee el resultado de una etapa {"$count": "count"}"""
+    return rows[0]["count"] if rows else 0
@@ -0,0 +1,113 @@
+"""
+Estadísticas de pagos por contrato mantenidas de forma incremental.
+
+Cada documento de la colección pay_stats tiene como _id el ObjectId del
+contrato y acumula cantidad, suma, pagados/pendientes y la fecha del último
+pago. create_pay, create_pays y update_Pay lo actualizan con $inc; para
+reconstruirlo desde cero:
+
+    python -m utils.pay_stats rebuild
+"""
+import asyncio
+import sys
+
+from pymongo import UpdateOne
+
+from utils.mongodb import get_collection, aggregate
+from utils.etag import versions
+
+STATS_COLLECTION = "pay_stats"
+
+stats_coll = get_collection(STATS_COLLECTION)
+pays_coll = get_collection("pays")
+
+
+def _contribution(pay: dict, sign: int = 1) -> dict:
+    """Aporte de un pago a las estadísticas de su contrato (sign=-1 para retirarlo)"""
+    cost = pay.get("cost", 0) * sign
+    paid = pay.get("is_paid", True) is not False
+    return {
+        "count": sign,
+        "sum": cost,
+        "paid_count": sign if paid else 0,
+        "paid_sum": cost if paid else 0,
+        "unpaid_count": 0 if paid else sign,
+        "unpaid_sum": 0 if paid else cost,
+    }
+
+
+async def _apply(contract_id, inc: dict, date=None):
+    versions.bump("pays")
+    update = {"$inc": inc}
+    if date is not None:
+        update["$max"] = {"last_payment_date": date}
+    await stats_coll.update_one({"_id": contract_id}, update, upsert=True)
+
+
+async def record_pay(pay: dict):
+    """Suma un pago nuevo a las estadísticas de su contrato"""
+    await _apply(pay["id_Contract"], _contribution(pay), pay.get("date"))
+
+
+async def record_pays(pays: list[dict]):
+    """Suma varios pagos nuevos con una sola escritura por lotes"""
+    totals = {}
+    for pay in pays:
+        inc, date = totals.get(pay["id_Contract"], ({}, None))
+        for key, value in _contribution(pay).items():
+            inc[key] = inc.get(key, 0) + value
+        if pay.get("date") is not None and (date is None or pay["date"] > date):
+            date = pay["date"]
+        totals[pay["id_Contract"]] = (inc, date)
+
+    versions.bump("pays")
+    ops = []
+    for contract_id, (inc, date) in totals.items():
+        update = {"$inc": inc}
+        if date is not None:
+            update["$max"] = {"last_payment_date": date}
+        ops.append(UpdateOne({"_id": contract_id}, update, upsert=True))
+    if ops:
+        await stats_coll.bulk_write(ops, ordered=False)
+
+
+async def replace_pay(old: dict, new: dict):
+    """Sustituye el aporte de un pago modificado (puede cambiar de contrato)"""
+    removed = _contribution(old, -1)
+    added = _contribution(new)
+    if old.get("id_Contract") == new.get("id_Contract"):
+        delta = {key: removed[key] + added[key] for key in added}
+        await _apply(new["id_Contract"], delta, new.get("date"))
+    else:
+        await _apply(old["id_Contract"], removed)
+        await _apply(new["id_Contract"], added, new.get("date"))
+
+
+def rebuild_pipeline() -> list:
+    """Pipeline sobre pays que recalcula todas las estadísticas y reemplaza pay_stats"""
+    paid = {"$ne": ["$is_paid", False]}
+    return [
+        {"$group": {
+            "_id": "$id_Contract",
+            "count": {"$sum": 1},
+            "sum": {"$sum": "$cost"},
+            "paid_count": {"$sum": {"$cond": [paid, 1, 0]}},
+            "paid_sum": {"$sum": {"$cond": [paid, "$cost", 0]}},
+            "unpaid_count": {"$sum": {"$cond": [paid, 0, 1]}},
+            "unpaid_sum": {"$sum": {"$cond": [paid, 0, "$cost"]}},
+            "last_payment_date": {"$max": "$date"},
+        }},
+        {"$out": STATS_COLLECTION}
+    ]
+
+
+async def rebuild_pay_stats():
+    """Reconstruye pay_stats a partir de todos los pagos (reemplazo atómico con $out)"""
+    await aggregate(pays_coll, rebuild_pipeline())
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Uso: python -m utils.pay_stats rebuild")
+        sys.exit(2)
+    asyncio.run(rebuild_pay_stats())
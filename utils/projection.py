@@ -0,0 +1,41 @@
+"""
+Proyección de campos para las rutas de lectura.
+
+El parámetro ?fields=id,date,cost se convierte en una proyección de MongoDB y
+la respuesta se valida contra un modelo parcial (todos los campos opcionales).
+Las rutas usan response_model_exclude_none para omitir los campos no pedidos.
+"""
+from typing import Optional
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, Field, create_model
+
+
+def partial_model(model: type[BaseModel]) -> type[BaseModel]:
+    """Crea una variante del modelo con todos los campos opcionales"""
+    fields = {
+        name: (Optional[info.annotation], Field(default=None, description=info.description))
+        for name, info in model.model_fields.items()
+    }
+    return create_model(f"{model.__name__}Partial", __base__=model, **fields)
+
+
+def parse_fields(fields: str | None, model: type[BaseModel]) -> dict | None:
+    """Convierte "a,b,c" en una proyección de MongoDB validando los nombres contra el modelo"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos desconocidos: {', '.join(unknown)}")
+    # _id siempre se incluye: se expone como "id" y lo usa la paginación
+    return {name: 1 for name in names if name != "id"} or {"_id": 1}
+
+
+def projection_for(model: type[BaseModel]):
+    """Dependencia de FastAPI que lee ?fields= para el modelo indicado"""
+    def dependency(
+        fields: str | None = Query(None, description="Campos a devolver separados por coma, p. ej. id,date,cost")
+    ) -> dict | None:
+        return parse_fields(fields, model)
+    return dependency
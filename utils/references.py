@@ -0,0 +1,42 @@
+"""
+Representación canónica de las referencias entre colecciones.
+
+Todas las referencias (id_Contract, id_apartment, id_User, ...) se guardan como
+ObjectId para que cada búsqueda sea una igualdad de un solo tipo sobre un índice.
+Los modelos siguen exponiendo los IDs como texto.
+"""
+from bson import ObjectId
+from fastapi import HTTPException
+
+# Campos de referencia por colección
+REFERENCE_FIELDS: dict[str, list[str]] = {
+    "pays": ["id_Contract"],
+    "contracts": ["id_apartment", "id_User", "id_user"],
+    "maintenance": ["id_Contract", "id_Apartment", "id_Maintenance_type", "apartment_id"],
+}
+
+
+def parse_object_id(value) -> ObjectId | None:
+    """Convierte un valor a ObjectId; devuelve None si no es un ID válido"""
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return None
+
+
+def object_id_to_str(value):
+    """Para validadores de modelos: expone los ObjectId como texto"""
+    return str(value) if isinstance(value, ObjectId) else value
+
+
+def canonical_refs(data: dict, collection: str) -> dict:
+    """Convierte a ObjectId los campos de referencia presentes en el documento"""
+    for field in REFERENCE_FIELDS[collection]:
+        if data.get(field) is None:
+            continue
+        oid = parse_object_id(data[field])
+        if oid is None:
+            raise HTTPException(status_code=400, detail=f"ID inválido en {field}")
+        data[field] = oid
+    return data
@@ -1,7 +1,9 @@
 import os
+import time
 import secrets
 import hashlib
 import base64
+import threading
 import jwt
 
 from datetime import datetime, timedelta
@@ -10,12 +12,19 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from jwt import PyJWTError
 from functools import wraps
+from collections import OrderedDict
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 security = HTTPBearer()
 
+# Caché de tokens verificados: digest del token -> claims, válido hasta su "exp"
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+_token_cache: OrderedDict[str, dict] = OrderedDict()
+_token_cache_lock = threading.Lock()
+auth_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
 # Función para crear un JWT
 def create_jwt_token(
         full_name:str
@@ -40,167 +49,140 @@ def create_jwt_token(
     )
     return token
 
-def validateuser(func):
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        request = kwargs.get('request')
-        if not request:
-            raise HTTPException(status_code=400, detail="Request object not found")
+def _cached_claims(digest: str) -> dict | None:
+    with _token_cache_lock:
+        claims = _token_cache.get(digest)
+        if claims is None:
+            auth_cache_stats["misses"] += 1
+            return None
+        if claims["exp"] <= time.time():
+            del _token_cache[digest]
+            auth_cache_stats["misses"] += 1
+            return None
+        _token_cache.move_to_end(digest)
+        auth_cache_stats["hits"] += 1
+        return claims
+
+
+def _store_claims(digest: str, claims: dict):
+    with _token_cache_lock:
+        _token_cache[digest] = claims
+        _token_cache.move_to_end(digest)
+        while len(_token_cache) > AUTH_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+            auth_cache_stats["evictions"] += 1
+
+
+def get_auth_cache_stats() -> dict:
+    """Devuelve los contadores de la caché de tokens"""
+    with _token_cache_lock:
+        return {**auth_cache_stats, "size": len(_token_cache), "max_size": AUTH_CACHE_SIZE}
+
+
+def decode_token(token: str) -> dict:
+    """Decodifica y valida un JWT, reutilizando los claims ya verificados"""
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    claims = _cached_claims(digest)
+    if claims is not None:
+        return claims
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token or expired token")
 
-        authorization: str = request.headers.get("Authorization")
-        if not authorization:
-            raise HTTPException(status_code=400, detail="Authorization header missing")
+    exp = payload.get("exp")
+    if payload.get("email") is None or exp is None:
+        raise HTTPException(status_code=401, detail="Token Invalid")
 
-        schema, token = authorization.split()
-        if schema.lower() != "bearer":
-            raise HTTPException(status_code=400, detail="Invalid auth schema")
+    claims = {
+        "id": payload.get("id"),
+        "email": payload.get("email"),
+        "full_name": payload.get("full_name"),
+        "active": payload.get("active"),
+        "admin": payload.get("admin", False),
+        "exp": exp,
+    }
+    _store_claims(digest, claims)
+    return claims
 
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
 
-            email = payload.get("email")
-            full_name = payload.get("full_name")
-            active = payload.get("active")
-            exp = payload.get("exp")
-            user_id = payload.get("id")
-            admin = payload.get("admin", False) 
+def authenticate(token: str, require_admin: bool = False) -> dict:
+    """Valida el token y los permisos del usuario; devuelve sus claims"""
+    claims = decode_token(token)
 
-            if email is None:
-                raise HTTPException(status_code=401, detail="Token Invalid")
+    if claims["exp"] <= time.time():
+        raise HTTPException(status_code=401, detail="Expired token")
 
-            if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-                raise HTTPException(status_code=401, detail="Expired token")
+    if require_admin:
+        if not claims["active"] or not claims["admin"]:
+            raise HTTPException(status_code=401, detail="Inactive user or not admin")
+    elif not claims["active"]:
+        raise HTTPException(status_code=401, detail="Inactive user")
 
-            if not active:
-                raise HTTPException(status_code=401, detail="Inactive user")
+    return claims
 
-            #  guardar en request.state
-            request.state.email = email
-            request.state.full_name = full_name
-            request.state.id = user_id
-            request.state.admin = admin  
 
-        except PyJWTError:
-            raise HTTPException(status_code=401, detail="Invalid token or expired token")
+def _token_from_request(request: Request) -> str:
+    authorization: str = request.headers.get("Authorization")
+    if not authorization:
+        raise HTTPException(status_code=400, detail="Authorization header missing")
 
-        return await func(*args, **kwargs)
-    return wrapper
+    parts = authorization.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        raise HTTPException(status_code=400, detail="Invalid auth schema")
+    return parts[1]
 
 
-def validateadmin(func):
+def _set_request_state(request: Request, claims: dict):
+    request.state.email = claims["email"]
+    request.state.full_name = claims["full_name"]
+    request.state.id = claims["id"]
+    request.state.admin = claims["admin"]
+
+
+def _validate_request(func, require_admin: bool):
     @wraps(func)
-    async def wrapper( *args, **kwargs ):
+    async def wrapper(*args, **kwargs):
         request = kwargs.get('request')
         if not request:
-            raise HTTPException( status_code=400, detail="Request object not found"  )
-
-        authorization: str = request.headers.get("Authorization")
-        if not authorization:
-            raise HTTPException( status_code=400, detail="Authorization header missing"  )
-
-        schema, token = authorization.split()
-        if schema.lower() != "bearer":
-            raise HTTPException( status_code=400, detail="Invalid auth schema"  )
-
-        try:
-            payload = jwt.decode( token , SECRET_KEY, algorithms=["HS256"] )
+            raise HTTPException(status_code=400, detail="Request object not found")
 
-            email = payload.get("email")
-            full_name = payload.get("full_name")
-            active = payload.get("active")
-            admin = payload.get("admin")
-            exp = payload.get("exp")
-            id = payload.get("id")
+        claims = authenticate(_token_from_request(request), require_admin)
+        _set_request_state(request, claims)
 
-            if email is None:
-                raise HTTPException( status_code=401 , detail="Token Invalid" )
+        return await func(*args, **kwargs)
+    return wrapper
 
-            if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-                raise HTTPException( status_code=401 , detail="Expired token" )
 
-            if not active or not admin:
-                raise HTTPException( status_code=401 , detail="Inactive user or not admin" )
+def validateuser(func):
+    return _validate_request(func, require_admin=False)
 
-            request.state.email = email
-            request.state.full_name = full_name
-            request.state.admin = admin
-            request.state.id = id
 
+def validateadmin(func):
+    return _validate_request(func, require_admin=True)
 
-        except PyJWTError:
-            raise HTTPException( status_code=401, detail="Invalid token or expired token"  )
 
-        return await func( *args, **kwargs )
-    return wrapper
+def _user_dict(claims: dict) -> dict:
+    return {
+        "id": claims["id"],
+        "email": claims["email"],
+        "full_name": claims["full_name"],
+        "active": claims["active"],
+        "role": "admin" if claims["admin"] else "user"
+    }
 
 
 # Funciones para FastAPI 
-def validate_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+def validate_token(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Validar token JWT para usuarios autenticados - Para usar con Depends()"""
-    token = credentials.credentials
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        
-        email = payload.get("email")
-        full_name = payload.get("full_name")
-        active = payload.get("active")
-        admin = payload.get("admin", False)
-        exp = payload.get("exp")
-        user_id = payload.get("id")
-        
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token Invalid")
-        
-        if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-            raise HTTPException(status_code=401, detail="Expired token")
-        
-        if not active:
-            raise HTTPException(status_code=401, detail="Inactive user")
-        
-        return {
-            "id": user_id,
-            "email": email,
-            "full_name": full_name,
-            "active": active,
-            "role": "admin" if admin else "user"
-        }
-        
-    except PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token or expired token")
+    claims = authenticate(credentials.credentials)
+    _set_request_state(request, claims)
+    return _user_dict(claims)
 
 
-def validate_admin(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+def validate_admin(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Validar token JWT para administradores - Para usar con Depends()"""
-    token = credentials.credentials
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        
-        email = payload.get("email")
-        full_name = payload.get("full_name")
-        active = payload.get("active")
-        admin = payload.get("admin", False)
-        exp = payload.get("exp")
-        user_id = payload.get("id")
-        
-        if email is None:
-            raise HTTPException(status_code=401, detail="Token Invalid")
-        
-        if datetime.utcfromtimestamp(exp) < datetime.utcnow():
-            raise HTTPException(status_code=401, detail="Expired token")
-        
-        if not active or not admin:
-            raise HTTPException(status_code=401, detail="Inactive user or not admin")
-        
-        return {
-            "id": user_id,
-            "email": email,
-            "full_name": full_name,
-            "active": active,
-            "role": "admin"
-        }
-        
-    except PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token or expired token")
-    
\ No newline at end of file
+    claims = authenticate(credentials.credentials, require_admin=True)
+    _set_request_state(request, claims)
+    return _user_dict(claims)